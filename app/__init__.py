@@ -1,21 +1,43 @@
+import logging
 import os
-from datetime import timedelta
-from flask import Flask
+from flask import Flask, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
-from flask_migrate import Migrate
 from flask_mail import Mail
-from flask_caching import Cache
-from celery import Celery
-from .cache import cache
+from celery import Celery, Task
+from .cache import cache, init_local_cache
+from .compression import init_compression
 
 # Initialize Flask extensions
 db = SQLAlchemy()
 jwt = JWTManager()
 mail = Mail()
-migrate = Migrate()
-celery = Celery()
+
+class FlaskTask(Task):
+    """Celery task run inside an application context of the app that configured Celery"""
+
+    def __call__(self, *args, **kwargs):
+        # run() directly, like Task.__call__ but without replacing the worker's request context
+        if has_app_context():
+            return self.run(*args, **kwargs)
+        with self.app.flask_app.app_context():
+            return self.run(*args, **kwargs)
+
+celery = Celery(__name__, task_cls=FlaskTask)
+
+def configure_sqlite(engine, pragmas):
+    """Apply PRAGMA settings to every new connection of a SQLite engine"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+    
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
 
 def create_app(config_name='development'):
     app = Flask(__name__)
@@ -26,48 +48,57 @@ def create_app(config_name='development'):
     
     # Initialize extensions
     db.init_app(app)
+    with app.app_context():
+        configure_sqlite(db.engine, app.config.get('SQLITE_PRAGMAS', {}))
     jwt.init_app(app)
     mail.init_app(app)
-    migrate.init_app(app, db)
     cache.init_app(app)
+    init_local_cache(app)
     
-    # Configure Celery
-    celery.conf.update(app.config)
+    # Faster JSON encoding when orjson is installed
+    from .serializers import OrjsonProvider, orjson
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
     
-    # Register blueprints
-    print("\nRegistering blueprints...")
+    # Configure Celery: static settings and the beat schedule, then this environment's broker and backend
+    celery.config_from_object('app.celery_config')
+    celery.conf.update(app.config['CELERY'])
+    celery.flask_app = app
     
-    # Import and register blueprints
+    # Register blueprints
     from .auth import auth_bp
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
-    print("Auth blueprint registered")
     
     from .admin.routes import admin_bp
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
-    print("Admin blueprint registered")
     
     from .user.routes import user_bp
     app.register_blueprint(user_bp, url_prefix='/api/user')
-    print("User blueprint registered")
     
-    # Create database tables
-    with app.app_context():
-        db.create_all()
-        print("Database tables created")
+    # Register CLI commands
+    from .commands import register_commands
+    register_commands(app)
+    
+    # Flask-Migrate pulls in Alembic, which dominates import time. Only load it
+    # where migrations can run: under the flask CLI or when explicitly enabled.
+    if app.config.get('ENABLE_MIGRATIONS') or os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    
+    # Create database tables (production relies on migrations instead)
+    if app.config.get('AUTO_CREATE_TABLES'):
+        with app.app_context():
+            db.create_all()
     
     # Enable CORS
     CORS(app)
-    print("CORS enabled")
     
-    # Print registered routes for debugging
-    print("\nRegistered Routes:")
-    for rule in app.url_map.iter_rules():
-        print(f"{rule.endpoint}: {rule.methods} {rule.rule}")
-        
-    # Print auth routes specifically
-    print("\nAuth Routes:")
-    auth_routes = [rule for rule in app.url_map.iter_rules() if rule.endpoint.startswith('auth.')]
-    for rule in auth_routes:
-        print(f"- {rule.endpoint}: {rule.methods} {rule.rule}")
+    # Compress large JSON responses for clients that accept it
+    init_compression(app)
+    
+    # Log registered routes for debugging
+    if app.logger.isEnabledFor(logging.DEBUG):
+        for rule in app.url_map.iter_rules():
+            app.logger.debug("%s: %s %s", rule.endpoint, sorted(rule.methods), rule.rule)
     
-    return app 
\ No newline at end of file
+    return app
@@ -10,5 +10,7 @@ from app.admin.routes import (
     create_subject, get_subjects,
     create_chapter,
     create_quiz, get_quiz,
-    get_users, get_user, toggle_user_block
+    get_users, get_user, toggle_user_block,
+    cache_stats,
+    start_export, get_export, download_export
 ) 
\ No newline at end of file
@@ -1,11 +1,17 @@
-from flask import Blueprint, request, jsonify
+import os
+import uuid
+from flask import Blueprint, request, jsonify, current_app, send_file, url_for, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import User, Subject, Chapter, Quiz, Question, QuizAttempt, UserAnswer
 from app import db
 from datetime import datetime
 from sqlalchemy import func
-from ..auth.utils import admin_required
-from ..cache import admin_cache_response, clear_admin_cache, clear_subject_cache, clear_quiz_cache
+from ..auth.utils import admin_required, revoke_user_tokens
+from ..pagination import paginate, wants_pagination
+from ..serializers import ADMIN_CATALOG, ADMIN_QUIZ, build_tree, requested_levels, user_query, serialize_user
+from ..tasks import run_export_job
+from ..exports import export_path, record_export_job, forget_export_job, export_job_exists
+from ..cache import admin_cache_response, clear_admin_cache, clear_subject_cache, clear_quiz_cache, get_cache_stats
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -17,16 +23,19 @@ def create_subject():
     subject = Subject(name=data['name'], description=data.get('description', ''))
     db.session.add(subject)
     db.session.commit()
-    clear_admin_cache()
+    clear_subject_cache(subject.id)
     return jsonify(subject.to_dict()), 201
 
 @admin_bp.route('/subjects', methods=['GET'])
 @jwt_required()
 @admin_required
-@admin_cache_response(timeout=300)  # Cache for 5 minutes
+@admin_cache_response(timeout=300, local=True)  # Cache for 5 minutes
 def get_subjects():
-    subjects = Subject.query.all()
-    return jsonify([subject.to_dict() for subject in subjects])
+    try:
+        levels = requested_levels(ADMIN_CATALOG)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(build_tree(levels))
 
 @admin_bp.route('/chapters', methods=['POST'])
 @jwt_required()
@@ -72,24 +81,40 @@ def create_quiz():
         db.session.add(question)
     
     db.session.commit()
-    clear_admin_cache()
+    clear_quiz_cache(quiz.id)
     return jsonify(quiz.to_dict()), 201
 
 @admin_bp.route('/quizzes/<int:quiz_id>', methods=['GET'])
 @jwt_required()
 @admin_required
-@admin_cache_response(timeout=300)  # Cache for 5 minutes
+@admin_cache_response(timeout=300, local=True)  # Cache for 5 minutes
 def get_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
-    return jsonify(quiz.to_dict())
+    try:
+        levels = requested_levels(ADMIN_QUIZ)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    quizzes = build_tree(levels, root_filter=Quiz.id == quiz_id)
+    if not quizzes:
+        abort(404)
+    return jsonify(quizzes[0])
 
 @admin_bp.route('/users', methods=['GET'])
 @jwt_required()
 @admin_required
 @admin_cache_response(timeout=300)  # Cache for 5 minutes
 def get_users():
-    users = User.query.filter_by(is_admin=False).all()
-    return jsonify([user.to_dict() for user in users])
+    query = user_query().filter(User.is_admin == False)
+    if not wants_pagination():
+        return jsonify([serialize_user(user) for user in query.all()])
+    
+    try:
+        users, next_cursor = paginate(query, [User.id])
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    return jsonify({
+        'items': [serialize_user(user) for user in users],
+        'next_cursor': next_cursor
+    })
 
 @admin_bp.route('/users/<int:user_id>', methods=['GET'])
 @jwt_required()
@@ -106,5 +131,66 @@ def toggle_user_block(user_id):
     user = User.query.get_or_404(user_id)
     user.is_blocked = not user.is_blocked
     db.session.commit()
+    revoke_user_tokens(user_id)
     clear_admin_cache()
-    return jsonify(user.to_dict()) 
\ No newline at end of file
+    return jsonify(user.to_dict()) 
+
+@admin_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def cache_stats():
+    return jsonify(get_cache_stats())
+
+@admin_bp.route('/exports', methods=['POST'])
+@jwt_required()
+@admin_required
+def start_export():
+    data = request.get_json(silent=True) or {}
+    job_id = str(uuid.uuid4())
+    os.makedirs(current_app.config['EXPORT_DIR'], exist_ok=True)
+    record_export_job(job_id)
+    try:
+        run_export_job.apply_async(
+            args=[export_path(job_id)],
+            kwargs={'user_id': data.get('user_id')},
+            task_id=job_id
+        )
+    except Exception:
+        forget_export_job(job_id)
+        raise
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('admin.get_export', job_id=job_id)
+    }), 202
+
+@admin_bp.route('/exports/<uuid:job_id>', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_export(job_id):
+    if not export_job_exists(job_id):
+        return jsonify({'error': 'Export not found'}), 404
+    result = run_export_job.AsyncResult(str(job_id))
+    response = {'job_id': str(job_id), 'state': result.state}
+    if result.state in ('PROGRESS', 'SUCCESS') and isinstance(result.info, dict):
+        response.update(result.info)
+    if result.state == 'SUCCESS':
+        response['download_url'] = url_for('admin.download_export', job_id=job_id)
+    elif result.state == 'FAILURE':
+        response['error'] = str(result.info)
+    return jsonify(response)
+
+@admin_bp.route('/exports/<uuid:job_id>/download', methods=['GET'])
+@jwt_required()
+@admin_required
+def download_export(job_id):
+    path = export_path(job_id)
+    if not export_job_exists(job_id) or not os.path.exists(path):
+        return jsonify({'error': 'Export not found or not finished'}), 404
+    # conditional=True answers Range requests with 206 so clients can resume
+    return send_file(
+        path,
+        mimetype='application/gzip',
+        as_attachment=True,
+        download_name='quiz_data.csv.gz',
+        conditional=True
+    )
@@ -2,6 +2,7 @@ from flask import request, jsonify
 from flask_jwt_extended import create_access_token
 from app.models import User
 from app import db
+from app.auth.utils import auth_claims
 from datetime import datetime
 
 def register():
@@ -39,7 +40,7 @@ def login():
     user = User.query.filter_by(email=data['email']).first()
     
     if user and user.check_password(data['password']):
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(identity=user.id, additional_claims=auth_claims(user))
         return jsonify({
             'access_token': access_token,
             'user': {
@@ -61,7 +62,7 @@ def admin_login():
     user = User.query.filter_by(email=data['email'], is_admin=True).first()
     
     if user and user.check_password(data['password']):
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(identity=user.id, additional_claims=auth_claims(user))
         return jsonify({
             'access_token': access_token,
             'user': {
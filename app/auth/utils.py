@@ -1,16 +1,43 @@
 from functools import wraps
 from flask import jsonify
-from flask_jwt_extended import get_jwt_identity
-from app.models import User
+from flask_jwt_extended import get_jwt
+from app import jwt
+from ..cache import auth_generation_cache, get_generations, bump_generation
+
+# Authorization state travels in the access token as extra claims, so checking
+# it costs no database query. Tokens are revoked by bumping the user's auth
+# generation; the current generation is served from an in-process LRU of its
+# own and kept fresh by the Redis pub/sub invalidation broadcast.
+
+def _auth_namespace(user_id):
+    return f"auth_{user_id}"
+
+def auth_claims(user):
+    """Additional JWT claims describing what the user is allowed to do"""
+    [generation] = get_generations(_auth_namespace(user.id), local=True, store=auth_generation_cache)
+    return {
+        'is_admin': bool(user.is_admin),
+        'is_blocked': bool(user.is_blocked),
+        'auth_gen': generation
+    }
+
+def revoke_user_tokens(user_id):
+    """Invalidate every token issued to a user so new claims must be fetched by logging in again"""
+    bump_generation(_auth_namespace(user_id))
+
+@jwt.token_in_blocklist_loader
+def check_token_revoked(jwt_header, jwt_payload):
+    if 'auth_gen' not in jwt_payload:
+        # Issued before authorization claims existed
+        return True
+    [generation] = get_generations(_auth_namespace(jwt_payload['sub']), local=True, store=auth_generation_cache)
+    return jwt_payload['auth_gen'] != generation
 
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or not user.is_admin:
+        if not get_jwt().get('is_admin'):
             return jsonify({'error': 'Admin privileges required'}), 403
             
         return f(*args, **kwargs)
-    return decorated_function 
\ No newline at end of file
+    return decorated_function
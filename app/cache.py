@@ -1,6 +1,15 @@
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
+import redis
 from flask_caching import Cache
-from flask import current_app
+from flask import Response, current_app, request
+from .compression import available_encodings, compress, mark_encoded, negotiate_encoding, should_compress
 
 cache = Cache(config={
     'CACHE_TYPE': 'redis',
@@ -8,62 +17,356 @@ cache = Cache(config={
     'CACHE_DEFAULT_TIMEOUT': 300  # 5 minutes default timeout
 })
 
+# Every cache key embeds the generation counters of the namespaces it depends on.
+# Invalidating a namespace is a single counter bump: keys built under the old
+# generation are never read again and simply age out through their TTL.
+#
+#   user_<id>     - everything cached for one user
+#   admin         - everything cached for the admin views
+#   quiz_<id>     - responses about one quiz
+#   subject_<id>  - responses about one subject
+#   catalog       - responses spanning all subjects/chapters/quizzes
+#
+# Shared (user-independent) entries only carry the content generation.
+
+class LocalCache:
+    """Small in-process LRU with a per-entry TTL, kept in front of Redis"""
+
+    def __init__(self, maxsize=512, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+local_cache = LocalCache()
+
+# Generation counters are kept apart from the payloads so that they cannot evict
+# them; the per-user auth counters (one per active user) get a store of their own.
+generation_cache = LocalCache(maxsize=1024)
+auth_generation_cache = LocalCache(maxsize=10000)
+_generation_stores = (generation_cache, auth_generation_cache)
+
+# Generation bumps are broadcast on this channel so every worker drops its
+# local copy of the counter (and with it every L1 entry keyed on it).
+INVALIDATION_CHANNEL = 'cache_invalidation'
+
+_redis_client = None
+_listener = None
+_listener_pid = None
+
+# Counts local invalidations. A worker only stores a generation it read from
+# Redis if no invalidation arrived in the meantime, otherwise a bump landing
+# between the read and the store would leave the old value cached for a TTL.
+_invalidations = 0
+_invalidation_lock = threading.Lock()
+
+def init_local_cache(app, redis_client=None):
+    """Configure the in-process cache and the Redis client used for invalidation broadcasts"""
+    global _redis_client
+    local_cache.maxsize = app.config.get('LOCAL_CACHE_SIZE', 512)
+    generation_cache.maxsize = app.config.get('LOCAL_GENERATION_CACHE_SIZE', 1024)
+    auth_generation_cache.maxsize = app.config.get('LOCAL_AUTH_CACHE_SIZE', 10000)
+    for store in (local_cache, *_generation_stores):
+        store.ttl = app.config.get('LOCAL_CACHE_TTL', 30)
+        store.clear()
+    _redis_client = redis_client or redis.from_url(app.config['REDIS_URL'])
+
+def get_redis_client():
+    """The raw Redis client, for structures Flask-Caching does not model (e.g. sorted sets)"""
+    return _redis_client
+
+def _invalidate_local(namespace):
+    global _invalidations
+    with _invalidation_lock:
+        _invalidations += 1
+        for store in _generation_stores:
+            store.delete(_generation_key(namespace))
+
+def _listen(pubsub):
+    for message in pubsub.listen():
+        if message['type'] != 'message':
+            continue
+        namespace = message['data']
+        if isinstance(namespace, bytes):
+            namespace = namespace.decode()
+        _invalidate_local(namespace)
+
+def _ensure_listener():
+    """Start the invalidation subscriber for this process if it is not running"""
+    global _listener, _listener_pid
+    if _redis_client is None:
+        return
+    pid = os.getpid()
+    if _listener is not None and _listener.is_alive() and _listener_pid == pid:
+        return
+    if _listener_pid != pid:
+        # A forked worker inherits the parent's entries but not its subscriber
+        for store in (local_cache, *_generation_stores):
+            store.clear()
+    pubsub = _redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(INVALIDATION_CHANNEL)
+    _listener = threading.Thread(target=_listen, args=(pubsub,), daemon=True)
+    _listener.start()
+    _listener_pid = pid
+
+def _generation_key(namespace):
+    return f"gen_{namespace}"
+
+def get_generations(*namespaces, local=False, store=None):
+    """Fetch the current generation of each namespace in a single round trip
+
+    With local=True the counters are served from an in-process store
+    (generation_cache unless another is given) when possible and only fetched
+    from Redis after an invalidation or TTL expiry.
+    """
+    keys = [_generation_key(namespace) for namespace in namespaces]
+    if local:
+        store = store or generation_cache
+        _ensure_listener()
+        values = [store.get(key) for key in keys]
+        if None not in values:
+            return values
+        seen = _invalidations
+    values = [int(value or 0) for value in cache.get_many(*keys)]
+    if local:
+        with _invalidation_lock:
+            if _invalidations == seen:
+                for key, value in zip(keys, values):
+                    store.set(key, value)
+    return values
+
+def bump_generation(*namespaces):
+    """Invalidate every cache entry built under the given namespaces"""
+    for namespace in namespaces:
+        cache.cache.inc(_generation_key(namespace))
+        _invalidate_local(namespace)
+        if _redis_client is not None:
+            _redis_client.publish(INVALIDATION_CHANNEL, namespace)
+
+def _content_namespace(kwargs):
+    """Pick the content namespace a view depends on from its URL arguments"""
+    if 'quiz_id' in kwargs:
+        return f"quiz_{kwargs['quiz_id']}"
+    if 'subject_id' in kwargs:
+        return f"subject_{kwargs['subject_id']}"
+    return 'catalog'
+
+def _query_args():
+    """Normalised query string so that argument order does not split the cache"""
+    return sorted(request.args.items(multi=True))
+
 def get_cache_key(*args, **kwargs):
     """Generate a cache key based on the function arguments"""
     from flask_jwt_extended import get_jwt_identity
     user_id = get_jwt_identity()
-    return f"user_{user_id}_{args}_{kwargs}"
+    generations = get_generations(f"user_{user_id}", _content_namespace(kwargs))
+    return f"user_{user_id}_{request.endpoint}_{generations}_{args}_{kwargs}_{_query_args()}"
+
+def get_shared_cache_key(*args, local=False, **kwargs):
+    """Generate a user-independent cache key for content that is the same for everyone"""
+    generations = get_generations(_content_namespace(kwargs), local=local)
+    return f"shared_{request.endpoint}_{generations}_{args}_{kwargs}_{_query_args()}"
 
-def get_admin_cache_key(*args, **kwargs):
+def get_admin_cache_key(*args, local=False, **kwargs):
     """Generate a cache key for admin routes"""
-    return f"admin_{args}_{kwargs}"
+    generations = get_generations('admin', _content_namespace(kwargs), local=local)
+    return f"admin_{request.endpoint}_{generations}_{args}_{kwargs}_{_query_args()}"
+
+def _etag_key(cache_key):
+    return f"{cache_key}_etag"
+
+def _encode_entry(response):
+    """Turn a view response into a cache entry of pre-encoded bytes plus a content hash
+
+    Large bodies also get their compressed variants, so hits never compress.
+    """
+    body = response.get_data()
+    entry = {
+        'body': body,
+        'status': response.status_code,
+        'mimetype': response.mimetype,
+        'etag': hashlib.blake2b(body, digest_size=16).hexdigest()
+    }
+    if should_compress(body, response.mimetype):
+        entry['encoded'] = {encoding: compress(body, encoding) for encoding in available_encodings()}
+    return entry
+
+def _not_modified(etag):
+    response = Response(status=304)
+    # Echo the tag the way the client holds it: weak for a compressed copy
+    response.set_etag(etag, weak=request.if_none_match.is_weak(etag))
+    response.vary.add('Accept-Encoding')
+    return response
+
+def _build_response(entry):
+    """Replay a cache entry, answering 304 when the client already holds it"""
+    if request.if_none_match.contains_weak(entry['etag']):
+        return _not_modified(entry['etag'])
+    encoded = entry.get('encoded')
+    encoding = negotiate_encoding(encoded) if encoded else None
+    body = encoded[encoding] if encoding else entry['body']
+    response = Response(body, status=entry['status'], mimetype=entry['mimetype'])
+    response.set_etag(entry['etag'])
+    if encoding:
+        mark_encoded(response, encoding)
+    return response
+
+# Stampede protection: on a miss only the worker holding the key's lock runs
+# the view; the others wait briefly for its result, or keep serving the expired
+# entry (which stays in Redis for a grace period past its logical TTL). Entries
+# are also refreshed early with a probability that rises as expiry approaches
+# and with the cost of recomputing them ("XFetch").
+
+CACHE_STATS = ('coalesced_waits', 'wait_timeouts', 'stale_served', 'early_refreshes')
+
+def _lock_key(cache_key):
+    return f"{cache_key}_lock"
+
+def _record_stat(name):
+    """Count a cache event across all workers"""
+    cache.cache.inc(f"cache_stats_{name}")
+
+def get_cache_stats():
+    """Return the stampede protection counters"""
+    values = cache.get_many(*[f"cache_stats_{name}" for name in CACHE_STATS])
+    return {name: int(value or 0) for name, value in zip(CACHE_STATS, values)}
+
+def _needs_refresh(entry):
+    beta = current_app.config.get('CACHE_EARLY_REFRESH_BETA', 1.0)
+    return time.time() - entry['delta'] * beta * math.log(1.0 - random.random()) >= entry['expires']
+
+def _compute_entry(f, cache_key, timeout, args, kwargs):
+    """Run the view and store its encoded response; returns (entry, response)"""
+    started = time.time()
+    response = current_app.make_response(f(*args, **kwargs))
+    if response.status_code != 200:
+        return None, response
+    entry = _encode_entry(response)
+    entry['delta'] = time.time() - started
+    entry['expires'] = time.time() + timeout
+    grace = current_app.config.get('CACHE_STALE_GRACE', timeout)
+    cache.set_many({cache_key: entry, _etag_key(cache_key): entry['etag']}, timeout=timeout + grace)
+    return entry, response
+
+def _wait_for_entry(cache_key):
+    """Poll for an entry another worker is computing"""
+    deadline = time.monotonic() + current_app.config.get('CACHE_WAIT_TIMEOUT', 2)
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(cache_key)
+        if entry is not None:
+            return entry
+    return None
+
+def _cached_view(f, cache_key, timeout, args, kwargs, local=False):
+    """Serve a view from the cache, filling the entry on a miss"""
+    if local:
+        entry = local_cache.get(cache_key)
+        if entry is not None:
+            return _build_response(entry)
+
+    # Revalidation only needs the small ETag record, never the payload
+    if request.if_none_match:
+        etag = cache.get(_etag_key(cache_key))
+        if etag is not None and request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
+
+    entry = cache.get(cache_key)
+    if entry is None or _needs_refresh(entry):
+        lock_timeout = current_app.config.get('CACHE_LOCK_TIMEOUT', 10)
+        if cache.add(_lock_key(cache_key), 1, timeout=lock_timeout):
+            if entry is not None and entry['expires'] > time.time():
+                _record_stat('early_refreshes')
+            try:
+                new_entry, response = _compute_entry(f, cache_key, timeout, args, kwargs)
+            finally:
+                cache.delete(_lock_key(cache_key))
+            if new_entry is None:
+                return response
+            entry = new_entry
+        elif entry is not None:
+            # Someone else is refreshing it; the current copy will do meanwhile
+            if entry['expires'] <= time.time():
+                _record_stat('stale_served')
+        else:
+            _record_stat('coalesced_waits')
+            entry = _wait_for_entry(cache_key)
+            if entry is None:
+                _record_stat('wait_timeouts')
+                entry, response = _compute_entry(f, cache_key, timeout, args, kwargs)
+                if entry is None:
+                    return response
+    if local:
+        local_cache.set(cache_key, entry)
+    return _build_response(entry)
+
+def cache_response(timeout=300, shared=False, local=False):
+    """Decorator to cache API responses
 
-def cache_response(timeout=300):
-    """Decorator to cache API responses"""
+    With shared=True the entry is keyed on the route, its arguments and the
+    content generation only, so a single cached payload serves every user.
+    local=True additionally keeps shared entries in the in-process LRU.
+    """
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            cache_key = get_cache_key(*args, **kwargs)
-            rv = cache.get(cache_key)
-            if rv is not None:
-                return rv
-            rv = f(*args, **kwargs)
-            cache.set(cache_key, rv, timeout=timeout)
-            return rv
+            if shared:
+                cache_key = get_shared_cache_key(*args, local=local, **kwargs)
+            else:
+                cache_key = get_cache_key(*args, **kwargs)
+            return _cached_view(f, cache_key, timeout, args, kwargs, local=shared and local)
         return decorated_function
     return decorator
 
-def admin_cache_response(timeout=300):
+def admin_cache_response(timeout=300, local=False):
     """Decorator to cache admin API responses"""
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            cache_key = get_admin_cache_key(*args, **kwargs)
-            rv = cache.get(cache_key)
-            if rv is not None:
-                return rv
-            rv = f(*args, **kwargs)
-            cache.set(cache_key, rv, timeout=timeout)
-            return rv
+            cache_key = get_admin_cache_key(*args, local=local, **kwargs)
+            return _cached_view(f, cache_key, timeout, args, kwargs, local=local)
         return decorated_function
     return decorator
 
 def clear_cache_for_user(user_id):
     """Clear all cache entries for a specific user"""
-    # Since we can't easily clear by prefix with Redis, we'll need to implement
-    # a more sophisticated cache invalidation strategy in a production environment
-    cache.clear()
+    bump_generation(f"user_{user_id}")
 
 def clear_admin_cache():
     """Clear all admin cache entries"""
-    cache.clear()
+    bump_generation('admin')
 
 def clear_quiz_cache(quiz_id):
     """Clear cache for a specific quiz"""
-    cache.delete(f"quiz_{quiz_id}")
-    cache.delete(f"quiz_attempts_{quiz_id}")
+    bump_generation(f"quiz_{quiz_id}", 'catalog')
 
 def clear_subject_cache(subject_id):
     """Clear cache for a specific subject"""
-    cache.delete(f"subject_{subject_id}")
-    cache.delete(f"subject_chapters_{subject_id}") 
\ No newline at end of file
+    bump_generation(f"subject_{subject_id}", 'catalog')
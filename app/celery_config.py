@@ -1,8 +1,7 @@
 from celery.schedules import crontab
 
-# Celery Configuration
-broker_url = 'redis://localhost:6379/0'
-result_backend = 'redis://localhost:6379/0'
+# Celery Configuration, loaded by create_app; broker_url and result_backend
+# come from the CELERY setting of the Flask config
 task_serializer = 'json'
 result_serializer = 'json'
 accept_content = ['json']
@@ -18,5 +17,13 @@ beat_schedule = {
     'monthly-report': {
         'task': 'app.tasks.send_monthly_report',
         'schedule': crontab(0, 0, day_of_month='1')  # Run on the first day of each month
+    },
+    'drain-submissions': {
+        'task': 'app.tasks.drain_submissions',
+        'schedule': 60.0  # Safety net for queued submissions whose drain was never scheduled
+    },
+    'clean-exports': {
+        'task': 'app.tasks.clean_exports',
+        'schedule': crontab(minute=30)  # Run hourly
     }
 } 
\ No newline at end of file
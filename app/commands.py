@@ -0,0 +1,23 @@
+import click
+from flask.cli import with_appcontext
+
+@click.command('rebuild-stats')
+@with_appcontext
+def rebuild_stats_command():
+    """Backfill the user_subject_stats table from the attempt history."""
+    from app.stats import rebuild_user_subject_stats
+    rows = rebuild_user_subject_stats()
+    click.echo(f"Rebuilt {rows} user subject stats rows")
+
+@click.command('rebuild-leaderboards')
+@click.option('--quiz-id', type=int, help='Only rebuild this quiz')
+@with_appcontext
+def rebuild_leaderboards_command(quiz_id):
+    """Rebuild the Redis quiz leaderboards from the attempt history."""
+    from app.leaderboard import rebuild_leaderboards
+    quizzes = rebuild_leaderboards(quiz_id)
+    click.echo(f"Rebuilt leaderboards for {quizzes} quizzes")
+
+def register_commands(app):
+    app.cli.add_command(rebuild_stats_command)
+    app.cli.add_command(rebuild_leaderboards_command)
@@ -0,0 +1,72 @@
+import gzip
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Response compression. Bodies of at least COMPRESS_MIN_SIZE bytes with a
+# compressible mimetype are sent brotli- or gzip-encoded when the client
+# accepts it. Cached responses keep their compressed variants inside the cache
+# entry (see app.cache), so a cache hit never compresses again; every other
+# response is compressed on its way out by compress_response().
+#
+# A compressed body is a different representation of the same content, so its
+# ETag is sent weak; If-None-Match still matches it through the weak comparison.
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/csv')
+
+def available_encodings():
+    """Encodings this process can produce, in order of preference"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def should_compress(body, mimetype):
+    return mimetype in COMPRESSIBLE_MIMETYPES and len(body) >= current_app.config.get('COMPRESS_MIN_SIZE', 1024)
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=current_app.config.get('COMPRESS_BR_QUALITY', 5))
+    return gzip.compress(body, compresslevel=current_app.config.get('COMPRESS_GZIP_LEVEL', 6), mtime=0)
+
+def negotiate_encoding(encodings):
+    """Pick the one of `encodings` the client prefers, or None to send the body as is"""
+    accepted = request.accept_encodings
+    best = max(encodings, key=lambda encoding: accepted[encoding], default=None)
+    if best is None or accepted[best] <= 0:
+        return None
+    return best
+
+def mark_encoded(response, encoding):
+    """Label a response whose body has been replaced by its `encoding` variant"""
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+def compress_response(response):
+    """after_request hook compressing responses that are not already encoded"""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+    ):
+        return response
+
+    body = response.get_data()
+    if not should_compress(body, response.mimetype):
+        return response
+    encoding = negotiate_encoding(available_encodings())
+    if encoding is None:
+        return response
+    response.set_data(compress(body, encoding))
+    mark_encoded(response, encoding)
+    return response
+
+def init_compression(app):
+    app.after_request(compress_response)
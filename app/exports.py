@@ -0,0 +1,48 @@
+import os
+import time
+from flask import current_app
+from .cache import get_redis_client
+
+# Export jobs started from the admin API. Each job is recorded in Redis for
+# EXPORT_RETENTION seconds; only recorded jobs can be polled or downloaded, and
+# remove_expired_exports() deletes files older than that from EXPORT_DIR,
+# including partial files left behind by a crashed worker.
+#
+#   export_job_<id>  - a job started by start_export
+
+def _export_job_key(job_id):
+    return f"export_job_{job_id}"
+
+def export_path(job_id):
+    return os.path.join(current_app.config['EXPORT_DIR'], f"{job_id}.csv.gz")
+
+def record_export_job(job_id):
+    timeout = current_app.config.get('EXPORT_RETENTION', 86400)
+    get_redis_client().set(_export_job_key(job_id), 1, ex=timeout)
+
+def forget_export_job(job_id):
+    get_redis_client().delete(_export_job_key(job_id))
+
+def export_job_exists(job_id):
+    return bool(get_redis_client().exists(_export_job_key(job_id)))
+
+def remove_expired_exports():
+    """Delete export files older than EXPORT_RETENTION; returns the number removed"""
+    export_dir = current_app.config['EXPORT_DIR']
+    cutoff = time.time() - current_app.config.get('EXPORT_RETENTION', 86400)
+    removed = 0
+    try:
+        entries = list(os.scandir(export_dir))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if not entry.name.endswith(('.csv.gz', '.csv.gz.part')):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            # Replaced or removed by a running job meanwhile
+            pass
+    return removed
@@ -0,0 +1,97 @@
+from sqlalchemy import func
+from app import db
+from app.models import QuizAttempt
+from .cache import get_redis_client
+
+# Each quiz has a Redis sorted set of user_id -> best score. attempt_quiz raises
+# a user's entry with ZADD GT, and rank lookups are ZCOUNTs over the skip list,
+# so top-N, rank and percentile stay O(log n) however many attempts a quiz has.
+# Users with equal scores share a rank (1, 2, 2, 4).
+
+# Users written per pipeline round trip when rebuilding
+REBUILD_CHUNK_SIZE = 1000
+
+def _leaderboard_key(quiz_id):
+    return f"leaderboard_{quiz_id}"
+
+def record_leaderboard_score(quiz_id, user_id, score):
+    """Raise the user's best score on the quiz leaderboard; lower scores are ignored"""
+    get_redis_client().zadd(_leaderboard_key(quiz_id), {str(user_id): score}, gt=True)
+
+def _rank_above(client, key, score):
+    """Number of users with a strictly higher score"""
+    return client.zcount(key, f"({score}", '+inf')
+
+def get_top_scores(quiz_id, limit):
+    """Return [(rank, user_id, score)] for the best `limit` users of a quiz"""
+    client = get_redis_client()
+    key = _leaderboard_key(quiz_id)
+    top = []
+    for index, (member, score) in enumerate(client.zrevrange(key, 0, limit - 1, withscores=True)):
+        if top and score == top[-1][2]:
+            rank = top[-1][0]
+        else:
+            rank = index + 1
+        top.append((rank, int(member), score))
+    return top
+
+def count_users(quiz_id):
+    return get_redis_client().zcard(_leaderboard_key(quiz_id))
+
+def get_user_standing(quiz_id, user_id):
+    """Return (rank, score, percentile) for a user, or None if they have not attempted the quiz"""
+    client = get_redis_client()
+    key = _leaderboard_key(quiz_id)
+    with client.pipeline(transaction=False) as pipe:
+        pipe.zscore(key, str(user_id))
+        pipe.zcard(key)
+        score, total = pipe.execute()
+    if score is None:
+        return None
+    above = _rank_above(client, key, score)
+    # Share of users this user scored at least as well as
+    percentile = round(100 * (total - above) / total, 2)
+    return above + 1, score, percentile
+
+def rebuild_leaderboards(quiz_id=None):
+    """Recompute quiz leaderboards from the attempt history; returns the number of quizzes rebuilt"""
+    client = get_redis_client()
+    query = db.session.query(
+        QuizAttempt.quiz_id, QuizAttempt.user_id, func.max(QuizAttempt.score)
+    ).group_by(QuizAttempt.quiz_id, QuizAttempt.user_id)
+    if quiz_id is not None:
+        query = query.filter(QuizAttempt.quiz_id == quiz_id)
+    query = query.order_by(QuizAttempt.quiz_id).yield_per(REBUILD_CHUNK_SIZE)
+
+    # Build into scratch keys and swap them in, so readers never see a partial set
+    rebuilt = set()
+    pipe = client.pipeline(transaction=False)
+    pending = 0
+    for row_quiz_id, user_id, score in query:
+        scratch = _leaderboard_key(row_quiz_id) + '_rebuild'
+        if row_quiz_id not in rebuilt:
+            pipe.delete(scratch)
+            rebuilt.add(row_quiz_id)
+        pipe.zadd(scratch, {str(user_id): score})
+        pending += 1
+        if pending >= REBUILD_CHUNK_SIZE:
+            pipe.execute()
+            pending = 0
+    pipe.execute()
+
+    with client.pipeline() as pipe:
+        for rebuilt_quiz_id in rebuilt:
+            key = _leaderboard_key(rebuilt_quiz_id)
+            pipe.rename(key + '_rebuild', key)
+        if quiz_id is not None:
+            stale = [] if quiz_id in rebuilt else [_leaderboard_key(quiz_id)]
+        else:
+            # Quizzes whose attempts are all gone
+            stale = [
+                key for key in client.scan_iter(match='leaderboard_*')
+                if not key.endswith(b'_rebuild') and int(key.split(b'_')[1]) not in rebuilt
+            ]
+        for key in stale:
+            pipe.delete(key)
+        pipe.execute()
+    return len(rebuilt)
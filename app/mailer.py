@@ -0,0 +1,109 @@
+import os
+import smtplib
+import time
+from itertools import islice
+from flask import current_app
+from app import mail
+
+# Batched mail dispatch. Messages are sent over one SMTP connection per batch
+# instead of one connection (and TLS handshake) per message. MAIL_BACKEND
+# selects where messages go:
+#
+#   smtp    - the configured SMTP server (default)
+#   memory  - appended to `outbox`, for tests and load testing
+#   file    - written as .eml files under MAIL_FILE_PATH
+
+outbox = []
+
+# Errors after which the connection is gone and worth re-opening once
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+def _batches(messages, size):
+    iterator = iter(messages)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+class _MailServerUnavailable(Exception):
+    """Raised by _send_smtp when the server cannot be reached, to stop further batches"""
+
+def _send_smtp(batch, failures):
+    """Send a batch over a single connection, reconnecting once if the server drops it.
+    
+    Opening a connection is attempted MAIL_CONNECT_ATTEMPTS times in a row with
+    exponential backoff; after that the unsent messages are recorded as failures
+    and _MailServerUnavailable is raised.
+    """
+    attempts = current_app.config.get('MAIL_CONNECT_ATTEMPTS', 3)
+    delay = current_app.config.get('MAIL_RETRY_DELAY', 1)
+    queue = list(batch)
+    retried = None
+    connect_failures = 0
+    while queue:
+        connected = False
+        try:
+            with mail.connect() as connection:
+                connected = True
+                connect_failures = 0
+                while queue:
+                    try:
+                        connection.send(queue[0])
+                    except RECONNECT_ERRORS:
+                        raise
+                    except Exception as e:
+                        # Rejected message (bad address, bad headers); the connection is still usable
+                        failures.append((queue[0], e))
+                    queue.pop(0)
+        except Exception as e:
+            if not connected:
+                connect_failures += 1
+                if connect_failures >= attempts:
+                    failures.extend((message, e) for message in queue)
+                    raise _MailServerUnavailable(str(e)) from e
+                time.sleep(delay * 2 ** (connect_failures - 1))
+                continue
+            if not queue:
+                # Dropped while saying goodbye; everything was delivered
+                return
+            if not isinstance(e, RECONNECT_ERRORS):
+                raise
+            if retried is queue[0]:
+                failures.append((queue.pop(0), e))
+            else:
+                retried = queue[0]
+
+def _send_file(batch, failures):
+    directory = current_app.config.get('MAIL_FILE_PATH', 'mail_outbox')
+    os.makedirs(directory, exist_ok=True)
+    for index, message in enumerate(batch):
+        path = os.path.join(directory, f"{time.time_ns()}-{index}.eml")
+        try:
+            with open(path, 'w') as eml:
+                eml.write(message.as_string())
+        except Exception as e:
+            failures.append((message, e))
+
+def _send_memory(batch, failures):
+    outbox.extend(batch)
+
+BACKENDS = {
+    'smtp': _send_smtp,
+    'file': _send_file,
+    'memory': _send_memory
+}
+
+def send_messages(messages, batch_size=None):
+    """Send an iterable of Messages in batches; returns a list of (message, exception) failures"""
+    backend = BACKENDS[current_app.config.get('MAIL_BACKEND', 'smtp')]
+    batch_size = batch_size or current_app.config.get('MAIL_BATCH_SIZE', 100)
+    failures = []
+    batches = _batches(messages, batch_size)
+    for batch in batches:
+        try:
+            backend(batch, failures)
+        except _MailServerUnavailable as e:
+            # Fail the rest without trying to connect again for every batch
+            failures.extend((message, e.__cause__) for batch in batches for message in batch)
+    return failures
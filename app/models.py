@@ -13,6 +13,7 @@ class User(UserMixin, db.Model):
     is_admin = db.Column(db.Boolean, default=False)
     is_blocked = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_attempt_at = db.Column(db.DateTime, index=True)  # Maintained by attempt_quiz
     quiz_attempts = db.relationship('QuizAttempt', backref='user', lazy=True)
 
     def set_password(self, password):
@@ -52,7 +53,7 @@ class Chapter(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
-    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     quizzes = db.relationship('Quiz', backref='chapter', lazy=True)
 
@@ -67,11 +68,11 @@ class Chapter(db.Model):
 
 class Quiz(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False, index=True)
     date_of_quiz = db.Column(db.DateTime, nullable=False)
     duration = db.Column(db.Integer, nullable=False)  # Duration in minutes
     remarks = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     questions = db.relationship('Question', backref='quiz', lazy=True)
     attempts = db.relationship('QuizAttempt', backref='quiz', lazy=True)
 
@@ -87,7 +88,7 @@ class Quiz(db.Model):
 
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
     question_statement = db.Column(db.Text, nullable=False)
     option1 = db.Column(db.String(200), nullable=False)
     option2 = db.Column(db.String(200), nullable=False)
@@ -111,12 +112,17 @@ class Question(db.Model):
         }
 
 class QuizAttempt(db.Model):
+    __table_args__ = (
+        # Attempt history, per-user exports and monthly report chunks
+        db.Index('ix_quiz_attempt_user_id_start_time', 'user_id', 'start_time'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
     score = db.Column(db.Float, nullable=False)
-    start_time = db.Column(db.DateTime, nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False, index=True)
     end_time = db.Column(db.DateTime)
+    submission_id = db.Column(db.String(36), unique=True, index=True)  # Set by queued submissions, dedupes replays
     answers = db.relationship('UserAnswer', backref='attempt', lazy=True)
 
     def to_dict(self):
@@ -135,7 +141,7 @@ class QuizAttempt(db.Model):
 
 class UserAnswer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    attempt_id = db.Column(db.Integer, db.ForeignKey('quiz_attempt.id'), nullable=False)
+    attempt_id = db.Column(db.Integer, db.ForeignKey('quiz_attempt.id'), nullable=False, index=True)
     question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
     selected_option = db.Column(db.Integer, nullable=False)  # 1, 2, 3, or 4
     is_correct = db.Column(db.Boolean, nullable=False)
@@ -150,4 +156,13 @@ class UserAnswer(db.Model):
                 'correct_option': self.question.correct_option,
                 'marks': self.question.marks
             }
-        } 
\ No newline at end of file
+        }
+
+class UserSubjectStats(db.Model):
+    # Denormalized per-subject totals, updated in the same transaction as each attempt
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), primary_key=True)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0)
+    best_score = db.Column(db.Float)
+    last_attempt_at = db.Column(db.DateTime)
@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+# Keyset (cursor) pagination: each page continues strictly after the sort key
+# of the last row of the previous page, so the cost of a page does not depend
+# on how deep into the result it is. The cursor is that sort key, encoded.
+
+def wants_pagination():
+    """Pagination is opt-in with ?limit=, ?cursor= or ?paginate=true; by default the full list is returned"""
+    paginate = request.args.get('paginate')
+    if paginate is not None:
+        return paginate.lower() not in ('0', 'false', 'no')
+    return 'limit' in request.args or 'cursor' in request.args
+
+def get_page_size():
+    default = current_app.config.get('PAGE_SIZE_DEFAULT', 50)
+    maximum = current_app.config.get('PAGE_SIZE_MAX', 500)
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, maximum))
+
+def encode_cursor(values):
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor, columns):
+    """Decode a cursor back into sort key values; raises ValueError if it is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError('Invalid cursor')
+        return [
+            datetime.fromisoformat(value) if column.type.python_type is datetime else value
+            for column, value in zip(columns, values)
+        ]
+    except Exception as e:
+        raise ValueError('Invalid cursor') from e
+
+def _after(columns, values, descending):
+    """Row-value comparison (a, b) > (x, y) spelled out for portability"""
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        tie = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*tie, column < value if descending else column > value))
+    return or_(*clauses)
+
+def paginate(query, columns, descending=False):
+    """Return (rows, next_cursor) for the page of query selected by ?cursor= and ?limit="""
+    limit = get_page_size()
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+    return rows, next_cursor
@@ -0,0 +1,39 @@
+from flask import current_app
+from app import db
+from app.models import Quiz, Question
+from .cache import cache, local_cache, get_generations
+
+# Scoring only needs question_id -> (correct_option, marks). The compiled
+# answer key of a quiz is kept in the in-process cache and in Redis, keyed on
+# the quiz generation, so clear_quiz_cache() retires it together with every
+# other cached view of the quiz.
+
+def _answer_key_cache_key(quiz_id, generation):
+    return f"answer_key_{quiz_id}_{generation}"
+
+def compile_answer_key(quiz_id):
+    """Build the answer key of a quiz from the database, or None if the quiz does not exist"""
+    rows = db.session.query(
+        Question.id, Question.correct_option, Question.marks
+    ).filter(Question.quiz_id == quiz_id).all()
+    if not rows and db.session.query(Quiz.id).filter(Quiz.id == quiz_id).first() is None:
+        return None
+    return {question_id: (correct_option, marks) for question_id, correct_option, marks in rows}
+
+def get_answer_key(quiz_id):
+    """Return {question_id: (correct_option, marks)} for a quiz, or None if it does not exist"""
+    [generation] = get_generations(f"quiz_{quiz_id}", local=True)
+    key = _answer_key_cache_key(quiz_id, generation)
+
+    answer_key = local_cache.get(key)
+    if answer_key is not None:
+        return answer_key
+
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = compile_answer_key(quiz_id)
+        if answer_key is None:
+            return None
+        cache.set(key, answer_key, timeout=current_app.config.get('ANSWER_KEY_TIMEOUT', 86400))
+    local_cache.set(key, answer_key)
+    return answer_key
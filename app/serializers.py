@@ -0,0 +1,249 @@
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from app import db
+from app.models import User, Subject, Chapter, Quiz, Question, QuizAttempt, UserAnswer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Row-based serializers. Endpoints select just the columns they return as plain
+# rows and build the JSON dicts from those, instead of hydrating ORM objects and
+# walking relationships through to_dict(). Timestamps are formatted with
+# isoformat(' ', 'seconds'), which yields the same text as
+# strftime('%Y-%m-%d %H:%M:%S') several times faster.
+
+def format_datetime(value):
+    return value.isoformat(' ', 'seconds') if value is not None else None
+
+# Nested catalogs are described level by level as
+# (children key, model, column referencing the parent level, {field: column});
+# build_tree() runs one flat query per level and nests the rows by id.
+
+USER_CATALOG = (
+    (None, Subject, None, {
+        'id': Subject.id,
+        'name': Subject.name,
+        'description': Subject.description
+    }),
+    ('chapters', Chapter, Chapter.subject_id, {
+        'id': Chapter.id,
+        'name': Chapter.name
+    }),
+    ('quizzes', Quiz, Quiz.chapter_id, {
+        'id': Quiz.id,
+        'date_of_quiz': Quiz.date_of_quiz,
+        'duration': Quiz.duration,
+        'remarks': Quiz.remarks
+    })
+)
+
+USER_QUIZ = (
+    (None, Quiz, None, {
+        'id': Quiz.id,
+        'chapter_id': Quiz.chapter_id,
+        'date_of_quiz': Quiz.date_of_quiz,
+        'duration': Quiz.duration,
+        'remarks': Quiz.remarks
+    }),
+    ('questions', Question, Question.quiz_id, {
+        'id': Question.id,
+        'question_statement': Question.question_statement,
+        'option1': Question.option1,
+        'option2': Question.option2,
+        'option3': Question.option3,
+        'option4': Question.option4,
+        'marks': Question.marks
+    })
+)
+
+# Same shapes as Subject.to_dict() and Quiz.to_dict()
+ADMIN_QUIZ = (
+    (None, Quiz, None, USER_QUIZ[0][3]),
+    ('questions', Question, Question.quiz_id, {
+        **USER_QUIZ[1][3],
+        'quiz_id': Question.quiz_id,
+        'correct_option': Question.correct_option
+    })
+)
+
+ADMIN_CATALOG = (
+    USER_CATALOG[0],
+    ('chapters', Chapter, Chapter.subject_id, {
+        'id': Chapter.id,
+        'name': Chapter.name,
+        'description': Chapter.description,
+        'subject_id': Chapter.subject_id
+    }),
+    ('quizzes', Quiz, Quiz.chapter_id, ADMIN_QUIZ[0][3]),
+    ADMIN_QUIZ[1]
+)
+
+def select_levels(levels, depth=None, fields=None):
+    """Trim a level description to `depth` nested levels and each level to the requested fields.
+
+    fields names root fields as-is and nested fields by their level key, e.g.
+    ['name', 'chapters.name', 'quizzes.duration']; levels without requested
+    fields keep all of theirs, and `id` is always included. Raises ValueError.
+    """
+    if depth is not None:
+        if depth < 0:
+            raise ValueError('Invalid depth')
+        levels = levels[:depth + 1]
+    if not fields:
+        return levels
+
+    requested = {}
+    for name in fields:
+        key, _, field = name.rpartition('.')
+        requested.setdefault(key or None, set()).add(field)
+    selected = []
+    for children_key, model, parent_column, level_fields in levels:
+        names = requested.pop(children_key, None)
+        if names is not None:
+            unknown = names.difference(level_fields)
+            if unknown:
+                prefix = f"{children_key}." if children_key else ''
+                raise ValueError(f"Unknown field: {prefix}{sorted(unknown)[0]}")
+            level_fields = {
+                name: column for name, column in level_fields.items()
+                if name == 'id' or name in names
+            }
+        selected.append((children_key, model, parent_column, level_fields))
+    if requested:
+        key, names = next(iter(requested.items()))
+        raise ValueError(f"Unknown field: {key}.{sorted(names)[0]}")
+    return tuple(selected)
+
+def requested_levels(levels):
+    """select_levels() driven by the ?depth= and ?fields= query arguments"""
+    depth = request.args.get('depth')
+    fields = request.args.get('fields')
+    try:
+        depth = int(depth) if depth is not None else None
+    except ValueError:
+        raise ValueError('Invalid depth') from None
+    if fields is not None:
+        fields = [name.strip() for name in fields.split(',') if name.strip()]
+    return select_levels(levels, depth, fields)
+
+def build_tree(levels, root_filter=None):
+    """Return the list of root dicts described by levels, each with its children nested.
+
+    Without root_filter every row of every level is loaded; with it only the
+    matching roots and their descendants are.
+    """
+    roots = []
+    parents = None
+    for children_key, model, parent_column, fields in levels:
+        names = list(fields)
+        datetime_indexes = [
+            index for index, column in enumerate(fields.values())
+            if isinstance(column.type, db.DateTime)
+        ]
+        parent_id = parent_column if parent_column is not None else model.id
+        query = db.session.query(model.id, parent_id, *fields.values())
+        if parent_column is None:
+            if root_filter is not None:
+                query = query.filter(root_filter)
+        else:
+            if root_filter is not None:
+                query = query.filter(parent_column.in_(list(parents)))
+            for parent in parents.values():
+                parent[children_key] = []
+
+        current = {}
+        for row in query.order_by(model.id):
+            values = list(row[2:])
+            for index in datetime_indexes:
+                values[index] = format_datetime(values[index])
+            item = dict(zip(names, values))
+            current[row[0]] = item
+            if parent_column is None:
+                roots.append(item)
+            else:
+                parents[row[1]][children_key].append(item)
+        parents = current
+    return roots
+
+USER_COLUMNS = (
+    User.id, User.email, User.full_name, User.qualification,
+    User.date_of_birth, User.is_admin, User.is_blocked, User.created_at
+)
+
+def user_query():
+    return db.session.query(*USER_COLUMNS)
+
+def serialize_user(row):
+    """Same shape as User.to_dict()"""
+    id, email, full_name, qualification, date_of_birth, is_admin, is_blocked, created_at = row
+    return {
+        'id': id,
+        'email': email,
+        'full_name': full_name,
+        'qualification': qualification,
+        'date_of_birth': date_of_birth.isoformat() if date_of_birth else None,
+        'is_admin': is_admin,
+        'is_blocked': is_blocked,
+        'created_at': format_datetime(created_at)
+    }
+
+def attempt_query():
+    """Attempts joined with the names of their chapter and subject"""
+    return db.session.query(
+        QuizAttempt.id, QuizAttempt.quiz_id, QuizAttempt.score,
+        QuizAttempt.start_time, QuizAttempt.end_time,
+        Chapter.name.label('chapter_name'), Subject.name.label('subject_name')
+    ).select_from(QuizAttempt).join(
+        Quiz, QuizAttempt.quiz_id == Quiz.id
+    ).join(
+        Chapter, Quiz.chapter_id == Chapter.id
+    ).join(
+        Subject, Chapter.subject_id == Subject.id
+    )
+
+def serialize_attempt(row):
+    id, quiz_id, score, start_time, end_time, chapter_name, subject_name = row
+    return {
+        'id': id,
+        'quiz_id': quiz_id,
+        'score': score,
+        'start_time': format_datetime(start_time),
+        'end_time': format_datetime(end_time),
+        'quiz': {
+            'chapter': chapter_name,
+            'subject': subject_name
+        }
+    }
+
+def attempt_answers(attempt_id):
+    """Answers of an attempt with the question fields shown alongside them"""
+    rows = db.session.query(
+        UserAnswer.question_id, UserAnswer.selected_option, UserAnswer.is_correct,
+        Question.question_statement, Question.correct_option, Question.marks
+    ).join(
+        Question, UserAnswer.question_id == Question.id
+    ).filter(UserAnswer.attempt_id == attempt_id).order_by(UserAnswer.id)
+    return [{
+        'question_id': question_id,
+        'selected_option': selected_option,
+        'is_correct': is_correct,
+        'question': {
+            'statement': statement,
+            'correct_option': correct_option,
+            'marks': marks
+        }
+    } for question_id, selected_option, is_correct, statement, correct_option, marks in rows]
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, keeping the default provider's sorted keys and fallbacks"""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
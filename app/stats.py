@@ -0,0 +1,60 @@
+from sqlalchemy import case, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Chapter, Quiz, QuizAttempt, UserSubjectStats
+
+def record_attempt_stats(user_id, quiz_id, score, attempted_at):
+    """Fold one attempt into user_subject_stats; runs inside the caller's transaction"""
+    subject_id = db.session.query(Chapter.subject_id).join(
+        Quiz, Quiz.chapter_id == Chapter.id
+    ).filter(Quiz.id == quiz_id).scalar()
+
+    bump = update(UserSubjectStats).where(
+        UserSubjectStats.user_id == user_id,
+        UserSubjectStats.subject_id == subject_id
+    ).values(
+        attempt_count=UserSubjectStats.attempt_count + 1,
+        score_sum=UserSubjectStats.score_sum + score,
+        best_score=case((UserSubjectStats.best_score >= score, UserSubjectStats.best_score), else_=score),
+        last_attempt_at=case(
+            (UserSubjectStats.last_attempt_at >= attempted_at, UserSubjectStats.last_attempt_at),
+            else_=attempted_at
+        )
+    )
+    if db.session.execute(bump).rowcount:
+        return
+
+    # First attempt in this subject; a concurrent first attempt may win the insert
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(UserSubjectStats).values(
+                user_id=user_id,
+                subject_id=subject_id,
+                attempt_count=1,
+                score_sum=score,
+                best_score=score,
+                last_attempt_at=attempted_at
+            ))
+    except IntegrityError:
+        db.session.execute(bump)
+
+def rebuild_user_subject_stats():
+    """Recompute user_subject_stats from the full attempt history"""
+    history = db.session.query(
+        QuizAttempt.user_id,
+        Chapter.subject_id,
+        func.count(QuizAttempt.id),
+        func.sum(QuizAttempt.score),
+        func.max(QuizAttempt.score),
+        func.max(QuizAttempt.start_time)
+    ).join(Quiz, QuizAttempt.quiz_id == Quiz.id).join(
+        Chapter, Quiz.chapter_id == Chapter.id
+    ).group_by(QuizAttempt.user_id, Chapter.subject_id)
+
+    db.session.execute(UserSubjectStats.__table__.delete())
+    db.session.execute(insert(UserSubjectStats).from_select(
+        ['user_id', 'subject_id', 'attempt_count', 'score_sum', 'best_score', 'last_attempt_at'],
+        history.statement
+    ))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(UserSubjectStats).scalar()
@@ -0,0 +1,254 @@
+import json
+import uuid
+from datetime import datetime
+from celery.utils.log import get_task_logger
+from flask import current_app
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from app import db
+from app.models import User, QuizAttempt, UserAnswer
+from .cache import get_redis_client, clear_cache_for_user
+from .leaderboard import record_leaderboard_score
+from .stats import record_attempt_stats
+
+# Write-behind quiz submissions (SUBMISSION_MODE = 'queued'). attempt_quiz scores
+# the answers and pushes the attempt onto a Redis list; drain_submissions moves
+# batches onto a processing list and persists them with multi-row inserts in one
+# transaction. A batch stays on the processing list until it is committed, so a
+# crashed drain is replayed by the next one, and attempts already stored under
+# their submission_id are skipped, which makes the replay idempotent.
+#
+# The drain lock is renewed before every batch and all lock and processing list
+# updates check the lock token atomically, so a drain that has lost its lock
+# (e.g. after a stall longer than SUBMISSION_DRAIN_LOCK_TIMEOUT) stops instead of
+# racing the drain that took over.
+#
+#   submission_queue        - submissions waiting to be persisted
+#   submission_processing   - the batch currently being persisted
+#   submission_failed       - submissions that could not be persisted
+#   submission_<id>         - status of one submission, for the status endpoint
+
+logger = get_task_logger(__name__)
+
+QUEUE_KEY = 'submission_queue'
+PROCESSING_KEY = 'submission_processing'
+FAILED_KEY = 'submission_failed'
+DRAIN_LOCK_KEY = 'submission_drain_lock'
+DRAIN_SCHEDULED_KEY = 'submission_drain_scheduled'
+
+# KEYS[1] is the drain lock, ARGV[1] the token of the drain that should own it
+_RENEW_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+# Drops the committed batch (KEYS[2]) only while still holding the lock
+_FINISH_BATCH = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('del', KEYS[2])
+    return 1
+end
+return 0
+"""
+
+def _status_key(submission_id):
+    return f"submission_{submission_id}"
+
+def _set_statuses(client, statuses):
+    timeout = current_app.config.get('SUBMISSION_STATUS_TTL', 86400)
+    with client.pipeline(transaction=False) as pipe:
+        for submission_id, status in statuses.items():
+            pipe.set(_status_key(submission_id), json.dumps(status), ex=timeout)
+        pipe.execute()
+
+def enqueue_submission(user_id, quiz_id, score, start_time, end_time, answer_rows):
+    """Queue a scored attempt for persistence and return its submission_id"""
+    client = get_redis_client()
+    submission_id = str(uuid.uuid4())
+    payload = {
+        'submission_id': submission_id,
+        'user_id': user_id,
+        'quiz_id': quiz_id,
+        'score': score,
+        'start_time': start_time.isoformat(),
+        'end_time': end_time.isoformat(),
+        'answers': [[row['question_id'], row['selected_option'], row['is_correct']] for row in answer_rows]
+    }
+    _set_statuses(client, {submission_id: {'status': 'queued', 'user_id': user_id}})
+    client.rpush(QUEUE_KEY, json.dumps(payload))
+    _schedule_drain(client)
+    return submission_id
+
+def _schedule_drain(client):
+    """Start one drain per burst; submissions arriving meanwhile join its batches"""
+    delay = current_app.config.get('SUBMISSION_DRAIN_DELAY', 1)
+    if not client.set(DRAIN_SCHEDULED_KEY, 1, nx=True, ex=delay + 30):
+        return
+    from .tasks import drain_submissions
+    try:
+        drain_submissions.apply_async(countdown=delay)
+    except Exception:
+        # Still queued; the periodic drain picks it up
+        client.delete(DRAIN_SCHEDULED_KEY)
+        logger.exception('Could not schedule a submission drain')
+
+def get_submission_status(submission_id):
+    """Return the stored status dict of a submission, or None if unknown or expired"""
+    status = get_redis_client().get(_status_key(submission_id))
+    return json.loads(status) if status is not None else None
+
+def _take_batch(client, batch_size):
+    """Return the processing list, refilling it from the queue if the last batch was committed"""
+    pending = client.lrange(PROCESSING_KEY, 0, -1)
+    if pending:
+        return pending
+    with client.pipeline() as pipe:
+        for _ in range(batch_size):
+            pipe.lmove(QUEUE_KEY, PROCESSING_KEY, 'LEFT', 'RIGHT')
+        return [item for item in pipe.execute() if item is not None]
+
+def _persist(payloads):
+    """Insert a list of submission payloads in the current transaction; returns {submission_id: attempt_id}"""
+    ids = [payload['submission_id'] for payload in payloads]
+    existing = dict(
+        db.session.query(QuizAttempt.submission_id, QuizAttempt.id)
+        .filter(QuizAttempt.submission_id.in_(ids)).all()
+    )
+    new = {}
+    for payload in payloads:
+        if payload['submission_id'] not in existing:
+            new.setdefault(payload['submission_id'], payload)
+    if not new:
+        return existing
+
+    db.session.execute(insert(QuizAttempt), [{
+        'submission_id': payload['submission_id'],
+        'user_id': payload['user_id'],
+        'quiz_id': payload['quiz_id'],
+        'score': payload['score'],
+        'start_time': datetime.fromisoformat(payload['start_time']),
+        'end_time': datetime.fromisoformat(payload['end_time'])
+    } for payload in new.values()])
+    attempt_ids = dict(
+        db.session.query(QuizAttempt.submission_id, QuizAttempt.id)
+        .filter(QuizAttempt.submission_id.in_(list(new))).all()
+    )
+
+    answer_rows = [{
+        'attempt_id': attempt_ids[submission_id],
+        'question_id': question_id,
+        'selected_option': selected_option,
+        'is_correct': is_correct
+    } for submission_id, payload in new.items() for question_id, selected_option, is_correct in payload['answers']]
+    if answer_rows:
+        db.session.execute(insert(UserAnswer), answer_rows)
+
+    last_attempts = {}
+    for payload in new.values():
+        start_time = datetime.fromisoformat(payload['start_time'])
+        record_attempt_stats(payload['user_id'], payload['quiz_id'], payload['score'], start_time)
+        last_attempts[payload['user_id']] = max(start_time, last_attempts.get(payload['user_id'], start_time))
+    for user_id, start_time in last_attempts.items():
+        db.session.execute(update(User).where(
+            User.id == user_id,
+            (User.last_attempt_at == None) | (User.last_attempt_at < start_time)
+        ).values(last_attempt_at=start_time))
+    return {**existing, **attempt_ids}
+
+def _after_commit(client, payloads, attempt_ids):
+    for payload in payloads:
+        record_leaderboard_score(payload['quiz_id'], payload['user_id'], payload['score'])
+    for user_id in {payload['user_id'] for payload in payloads}:
+        clear_cache_for_user(user_id)
+    _set_statuses(client, {
+        payload['submission_id']: {
+            'status': 'persisted',
+            'user_id': payload['user_id'],
+            'attempt_id': attempt_ids[payload['submission_id']]
+        } for payload in payloads
+    })
+
+def _stored_attempt_id(submission_id):
+    return db.session.query(QuizAttempt.id).filter_by(submission_id=submission_id).scalar()
+
+def _record_failure(client, item, payload, error):
+    client.rpush(FAILED_KEY, item)
+    _set_statuses(client, {payload['submission_id']: {
+        'status': 'failed', 'user_id': payload['user_id'], 'error': str(error)
+    }})
+
+def _persist_batch(client, raw_batch, token):
+    """Persist one batch; a batch that cannot be inserted as a whole is retried one submission at a time"""
+    payloads = [json.loads(item) for item in raw_batch]
+    try:
+        attempt_ids = _persist(payloads)
+        db.session.commit()
+    except OperationalError:
+        # Database unavailable or locked: keep the batch for the next drain
+        db.session.rollback()
+        raise
+    except Exception:
+        db.session.rollback()
+        logger.exception('Submission batch failed, persisting one by one')
+        attempt_ids = {}
+        for item, payload in zip(raw_batch, payloads):
+            try:
+                attempt_ids.update(_persist([payload]))
+                db.session.commit()
+            except OperationalError:
+                db.session.rollback()
+                raise
+            except IntegrityError as e:
+                db.session.rollback()
+                attempt_id = _stored_attempt_id(payload['submission_id'])
+                if attempt_id is not None:
+                    # Stored meanwhile by another drain
+                    attempt_ids[payload['submission_id']] = attempt_id
+                    continue
+                logger.exception('Submission %s failed', payload['submission_id'])
+                _record_failure(client, item, payload, e)
+            except Exception as e:
+                db.session.rollback()
+                logger.exception('Submission %s failed', payload['submission_id'])
+                _record_failure(client, item, payload, e)
+        payloads = [payload for payload in payloads if payload['submission_id'] in attempt_ids]
+
+    _after_commit(client, payloads, attempt_ids)
+    if not client.eval(_FINISH_BATCH, 2, DRAIN_LOCK_KEY, PROCESSING_KEY, token):
+        # The batch now belongs to the drain holding the lock; its replay skips what was stored here
+        logger.warning('Submission drain lost its lock while persisting a batch')
+    return len(payloads)
+
+def drain_submission_queue():
+    """Persist queued submissions in batches until the queue is empty.
+
+    Returns the number of submissions persisted, or None if another drain holds the lock.
+    """
+    client = get_redis_client()
+    batch_size = current_app.config.get('SUBMISSION_BATCH_SIZE', 500)
+    lock_timeout = current_app.config.get('SUBMISSION_DRAIN_LOCK_TIMEOUT', 300)
+    token = str(uuid.uuid4())
+    if not client.set(DRAIN_LOCK_KEY, token, nx=True, ex=lock_timeout):
+        return None
+    # Submissions arriving from now on schedule another drain
+    client.delete(DRAIN_SCHEDULED_KEY)
+    persisted = 0
+    try:
+        while True:
+            # Each batch gets a full lock timeout, however long the drain has run
+            if not client.eval(_RENEW_LOCK, 1, DRAIN_LOCK_KEY, token, lock_timeout):
+                logger.warning('Submission drain lost its lock after %s submissions', persisted)
+                return persisted
+            raw_batch = _take_batch(client, batch_size)
+            if not raw_batch:
+                return persisted
+            persisted += _persist_batch(client, raw_batch, token)
+    finally:
+        client.eval(_RELEASE_LOCK, 1, DRAIN_LOCK_KEY, token)
@@ -1,39 +1,63 @@
-from app import celery, mail
-from app.models import User, Quiz, QuizAttempt
+from app import celery, mail, db
+from app.mailer import send_messages
+from app.submissions import drain_submission_queue
+from app.exports import remove_expired_exports
+from app.models import User, Subject, Chapter, Quiz, QuizAttempt
 from flask_mail import Message
+from celery import chord
+from celery.utils.log import get_task_logger
+from sqlalchemy import func, or_
+from flask import current_app
 from datetime import datetime, timedelta
+from itertools import groupby
 import csv
-from io import StringIO
+import gzip
 import os
+import tempfile
+
+logger = get_task_logger(__name__)
+
+# Rows fetched per round trip when streaming exports
+EXPORT_CHUNK_SIZE = 1000
+
+# Users handled by one monthly report worker task
+REPORT_CHUNK_SIZE = 500
 
 @celery.task
 def send_daily_reminder():
     """Send daily reminders to users about new quizzes and inactivity."""
-    # Get users who haven't attempted any quiz in the last 7 days
-    inactive_users = User.query.filter(
-        ~User.quiz_attempts.any(),
-        User.is_admin == False
-    ).all()
+    # Get users who haven't attempted any quiz within the inactivity window (indexed on last_attempt_at)
+    inactive_days = current_app.config.get('REMINDER_INACTIVITY_DAYS', 7)
+    inactive_since = datetime.utcnow() - timedelta(days=inactive_days)
+    inactive_users = db.session.query(User.email, User.full_name).filter(
+        User.is_admin == False,
+        or_(User.last_attempt_at == None, User.last_attempt_at < inactive_since)
+    ).yield_per(EXPORT_CHUNK_SIZE)
     
-    # Get new quizzes created in the last 24 hours
-    new_quizzes = Quiz.query.filter(
+    # Get new quizzes created in the last 24 hours, with their names, once for every user
+    new_quizzes = db.session.query(Chapter.name, Subject.name).select_from(Quiz).join(
+        Chapter, Quiz.chapter_id == Chapter.id
+    ).join(
+        Subject, Chapter.subject_id == Subject.id
+    ).filter(
         Quiz.created_at >= datetime.utcnow() - timedelta(days=1)
     ).all()
+    quiz_list = "\n".join([
+        f"- {chapter_name} ({subject_name})"
+        for chapter_name, subject_name in new_quizzes
+    ])
     
-    for user in inactive_users:
-        msg = Message(
-            'Daily Quiz Reminder',
-            sender=os.environ.get('MAIL_USERNAME'),
-            recipients=[user.email]
-        )
-        
-        if new_quizzes:
-            quiz_list = "\n".join([
-                f"- {quiz.chapter.name} ({quiz.chapter.subject.name})"
-                for quiz in new_quizzes
-            ])
-            msg.body = f"""
-            Hello {user.full_name},
+    def reminders():
+        for email, full_name in inactive_users:
+            msg = Message(
+                'Daily Quiz Reminder',
+                sender=os.environ.get('MAIL_USERNAME'),
+                recipients=[email]
+            )
+            
+            if new_quizzes:
+                msg.body = f"""
+            Hello {full_name},
             
             We noticed you haven't attempted any quizzes recently. Here are some new quizzes available:
             
@@ -41,42 +65,40 @@ def send_daily_reminder():
             
             Visit our platform to take these quizzes!
             """
-        else:
-            msg.body = f"""
-            Hello {user.full_name},
+            else:
+                msg.body = f"""
+            Hello {full_name},
             
             We noticed you haven't attempted any quizzes recently. Visit our platform to explore available quizzes!
             """
-        
-        mail.send(msg)
+            yield msg
+    
+    failures = send_messages(reminders())
+    for msg, error in failures:
+        logger.error('Daily reminder to %s failed: %s', msg.recipients, error)
+    return {'failed': len(failures)}
 
-@celery.task
-def send_monthly_report():
-    """Generate and send monthly activity reports to users."""
-    # Get all users except admin
-    users = User.query.filter_by(is_admin=False).all()
-    
-    for user in users:
-        # Get user's attempts for the previous month
-        last_month = datetime.utcnow().replace(day=1) - timedelta(days=1)
-        attempts = QuizAttempt.query.filter(
-            QuizAttempt.user_id == user.id,
-            QuizAttempt.start_time >= last_month.replace(day=1),
-            QuizAttempt.start_time <= last_month.replace(hour=23, minute=59, second=59)
-        ).all()
-        
-        if attempts:
-            # Calculate statistics
-            total_attempts = len(attempts)
-            total_score = sum(attempt.score for attempt in attempts)
-            average_score = total_score / total_attempts
-            
-            # Generate HTML report
-            html_content = f"""
+def _previous_month():
+    """Return the [start, end) datetimes of the previous calendar month"""
+    month_end = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    month_start = (month_end - timedelta(days=1)).replace(day=1)
+    return month_start, month_end
+
+def _render_monthly_report(full_name, month_start, total_attempts, total_score, attempts):
+    average_score = total_score / total_attempts
+    rows = ''.join(f"""
+                        <tr>
+                            <td>{subject}</td>
+                            <td>{chapter}</td>
+                            <td>{score}</td>
+                            <td>{start_time.strftime('%Y-%m-%d')}</td>
+                        </tr>
+                        """ for subject, chapter, score, start_time in attempts)
+    return f"""
             <html>
                 <body>
-                    <h2>Monthly Activity Report - {last_month.strftime('%B %Y')}</h2>
-                    <p>Hello {user.full_name},</p>
+                    <h2>Monthly Activity Report - {month_start.strftime('%B %Y')}</h2>
+                    <p>Hello {full_name},</p>
                     
                     <h3>Your Quiz Performance</h3>
                     <ul>
@@ -93,27 +115,160 @@ def send_monthly_report():
                             <th>Score</th>
                             <th>Date</th>
                         </tr>
-                        {''.join(f"""
-                        <tr>
-                            <td>{attempt.quiz.chapter.subject.name}</td>
-                            <td>{attempt.quiz.chapter.name}</td>
-                            <td>{attempt.score}</td>
-                            <td>{attempt.start_time.strftime('%Y-%m-%d')}</td>
-                        </tr>
-                        """ for attempt in attempts)}
+                        {rows}
                     </table>
                 </body>
             </html>
             """
-            
-            msg = Message(
-                f'Monthly Quiz Report - {last_month.strftime("%B %Y")}',
+
+@celery.task
+def send_monthly_report():
+    """Generate and send monthly activity reports to users.
+    
+    One grouped query finds every non-admin user with attempts last month and
+    their totals; the users are then split into chunks that workers render and
+    mail in parallel, with the per-chunk results summed up at the end.
+    """
+    month_start, month_end = _previous_month()
+    totals = (
+        db.session.query(QuizAttempt.user_id, func.count(QuizAttempt.id), func.sum(QuizAttempt.score))
+        .join(User, QuizAttempt.user_id == User.id)
+        .filter(
+            User.is_admin == False,
+            QuizAttempt.start_time >= month_start,
+            QuizAttempt.start_time < month_end
+        )
+        .group_by(QuizAttempt.user_id)
+        .order_by(QuizAttempt.user_id)
+        .all()
+    )
+    if not totals:
+        return {'chunks': 0, 'sent': 0, 'failed': []}
+    
+    totals = [list(row) for row in totals]
+    chunks = [totals[i:i + REPORT_CHUNK_SIZE] for i in range(0, len(totals), REPORT_CHUNK_SIZE)]
+    header = [send_monthly_report_chunk.s(chunk, month_start.isoformat()) for chunk in chunks]
+    callback = summarize_monthly_report.s().on_error(monthly_report_failed.s())
+    return chord(header)(callback).id
+
+@celery.task(bind=True)
+def send_monthly_report_chunk(self, totals, month_start):
+    """Render and send the monthly reports for one chunk of [user_id, attempts, score] rows.
+    
+    Errors are reported as failed users instead of raised, since one failed
+    chunk would otherwise fail the chord and lose the whole run's summary.
+    """
+    try:
+        return _send_monthly_report_chunk(self, totals, datetime.fromisoformat(month_start))
+    except Exception:
+        logger.exception('Monthly report chunk of %s users failed', len(totals))
+        return {'sent': 0, 'failed': [user_id for user_id, _, _ in totals]}
+
+def _send_monthly_report_chunk(task, totals, month_start):
+    month_end = (month_start + timedelta(days=32)).replace(day=1)
+    totals = {user_id: (attempts, score) for user_id, attempts, score in totals}
+    
+    # All of this chunk's attempts in one joined query, grouped per user below
+    rows = (
+        db.session.query(
+            User.id, User.email, User.full_name,
+            Subject.name, Chapter.name, QuizAttempt.score, QuizAttempt.start_time
+        )
+        .select_from(QuizAttempt)
+        .join(User, QuizAttempt.user_id == User.id)
+        .join(Quiz, QuizAttempt.quiz_id == Quiz.id)
+        .join(Chapter, Quiz.chapter_id == Chapter.id)
+        .join(Subject, Chapter.subject_id == Subject.id)
+        .filter(
+            QuizAttempt.user_id.in_(list(totals)),
+            QuizAttempt.start_time >= month_start,
+            QuizAttempt.start_time < month_end
+        )
+        .order_by(QuizAttempt.user_id, QuizAttempt.start_time)
+        .all()
+    )
+    
+    messages = []
+    failed = []
+    for (user_id, email, full_name), user_rows in groupby(rows, key=lambda row: row[:3]):
+        total_attempts, total_score = totals[user_id]
+        try:
+            messages.append((user_id, Message(
+                f'Monthly Quiz Report - {month_start.strftime("%B %Y")}',
                 sender=os.environ.get('MAIL_USERNAME'),
-                recipients=[user.email],
-                html=html_content
-            )
-            
-            mail.send(msg)
+                recipients=[email],
+                html=_render_monthly_report(
+                    full_name, month_start, total_attempts, total_score,
+                    [row[3:] for row in user_rows]
+                )
+            )))
+        except Exception:
+            logger.exception('Monthly report for user %s failed', user_id)
+            failed.append(user_id)
+    task.update_state(state='PROGRESS', meta={'rendered': len(messages), 'total': len(totals)})
+    
+    # One bad address or SMTP hiccup must not abort the rest of the chunk
+    user_ids = {id(msg): user_id for user_id, msg in messages}
+    failures = send_messages(msg for _, msg in messages)
+    for msg, error in failures:
+        logger.error('Monthly report for user %s failed: %s', user_ids[id(msg)], error)
+        failed.append(user_ids[id(msg)])
+    
+    return {'sent': len(messages) - len(failures), 'failed': failed}
+
+@celery.task
+def summarize_monthly_report(results):
+    """Combine the per-chunk results of a monthly report run."""
+    summary = {
+        'chunks': len(results),
+        'sent': sum(result['sent'] for result in results),
+        'failed': [user_id for result in results for user_id in result['failed']]
+    }
+    logger.info('Monthly report: %(sent)s sent, %(chunks)s chunks, failed users: %(failed)s', summary)
+    return summary
+
+@celery.task
+def monthly_report_failed(request, exc, traceback):
+    """Errback of the monthly report chord, run when a chunk task dies before returning."""
+    logger.error('Monthly report %s failed, no summary was produced: %r', request.id, exc)
+
+def write_attempts_csv(path, user_id=None, progress=None):
+    """Stream quiz attempts into a gzip-compressed CSV file and return the number of rows.
+    
+    With user_id only that user's attempts are written, otherwise every user's.
+    Rows come from a single joined query fetched in chunks, so memory use stays
+    bounded however many attempts there are. progress, if given, is called with
+    the number of rows written after every chunk.
+    """
+    header = ['Subject', 'Chapter', 'Score', 'Date']
+    columns = [Subject.name, Chapter.name, QuizAttempt.score, QuizAttempt.start_time]
+    if user_id is None:
+        header.insert(0, 'User')
+        columns.insert(0, User.full_name)
+    
+    query = (
+        db.session.query(*columns)
+        .select_from(QuizAttempt)
+        .join(Quiz, QuizAttempt.quiz_id == Quiz.id)
+        .join(Chapter, Quiz.chapter_id == Chapter.id)
+        .join(Subject, Chapter.subject_id == Subject.id)
+    )
+    if user_id is None:
+        query = query.join(User, QuizAttempt.user_id == User.id)
+    else:
+        query = query.filter(QuizAttempt.user_id == user_id)
+    query = query.order_by(QuizAttempt.id).yield_per(EXPORT_CHUNK_SIZE)
+    
+    rows = 0
+    with gzip.open(path, 'wt', newline='') as output:
+        writer = csv.writer(output)
+        writer.writerow(header)
+        for row in query:
+            writer.writerow([*row[:-1], row[-1].strftime('%Y-%m-%d %H:%M:%S')])
+            rows += 1
+            if progress and rows % EXPORT_CHUNK_SIZE == 0:
+                progress(rows)
+    return rows
 
 @celery.task
 def export_quiz_data(user_id, is_admin=False):
@@ -122,45 +277,69 @@ def export_quiz_data(user_id, is_admin=False):
     if not user:
         return
     
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    if is_admin:
-        # Admin export: All users' quiz data
-        writer.writerow(['User', 'Subject', 'Chapter', 'Score', 'Date'])
-        attempts = QuizAttempt.query.all()
-        for attempt in attempts:
-            writer.writerow([
-                attempt.user.full_name,
-                attempt.quiz.chapter.subject.name,
-                attempt.quiz.chapter.name,
-                attempt.score,
-                attempt.start_time.strftime('%Y-%m-%d %H:%M:%S')
-            ])
-    else:
-        # User export: Their own quiz data
-        writer.writerow(['Subject', 'Chapter', 'Score', 'Date'])
-        attempts = QuizAttempt.query.filter_by(user_id=user_id).all()
-        for attempt in attempts:
-            writer.writerow([
-                attempt.quiz.chapter.subject.name,
-                attempt.quiz.chapter.name,
-                attempt.score,
-                attempt.start_time.strftime('%Y-%m-%d %H:%M:%S')
-            ])
-    
-    # Send email with CSV attachment
-    msg = Message(
-        'Quiz Data Export',
-        sender=os.environ.get('MAIL_USERNAME'),
-        recipients=[user.email]
-    )
+    # Admin export: all users' quiz data; user export: their own quiz data
+    fd, path = tempfile.mkstemp(suffix='.csv.gz')
+    os.close(fd)
+    try:
+        write_attempts_csv(path, user_id=None if is_admin else user_id)
+        
+        # Send email with the compressed CSV attached
+        msg = Message(
+            'Quiz Data Export',
+            sender=os.environ.get('MAIL_USERNAME'),
+            recipients=[user.email]
+        )
+        
+        with open(path, 'rb') as export_file:
+            msg.attach(
+                'quiz_data.csv.gz',
+                'application/gzip',
+                export_file.read()
+            )
+        
+        msg.body = 'Please find your quiz data export attached.'
+        mail.send(msg)
+    finally:
+        os.remove(path)
+
+@celery.task(bind=True)
+def run_export_job(self, path, user_id=None):
+    """Write a quiz data export to path, reporting progress as task state."""
+    query = QuizAttempt.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    total = query.count()
     
-    msg.attach(
-        'quiz_data.csv',
-        'text/csv',
-        output.getvalue()
-    )
+    def report(rows_written):
+        self.update_state(state='PROGRESS', meta={'rows_written': rows_written, 'total': total})
     
-    msg.body = 'Please find your quiz data export attached.'
-    mail.send(msg) 
\ No newline at end of file
+    # Write under a temporary name so a partial file is never served
+    partial_path = path + '.part'
+    report(0)
+    try:
+        rows_written = write_attempts_csv(partial_path, user_id=user_id, progress=report)
+        os.replace(partial_path, path)
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return {'rows_written': rows_written, 'total': total}
+
+@celery.task
+def clean_exports():
+    """Delete export files past their retention period."""
+    removed = remove_expired_exports()
+    if removed:
+        logger.info('Removed %s expired export files', removed)
+    return {'removed': removed}
+
+@celery.task(bind=True, max_retries=None)
+def drain_submissions(self):
+    """Persist queued quiz submissions in batched inserts."""
+    persisted = drain_submission_queue()
+    if persisted is None:
+        # Another drain is running; check again once it is likely done
+        raise self.retry(countdown=current_app.config.get('SUBMISSION_DRAIN_DELAY', 1))
+    if persisted:
+        logger.info('Persisted %s queued submissions', persisted)
+    return {'persisted': persisted}
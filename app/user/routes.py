@@ -1,168 +1,227 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import User, Subject, Chapter, Quiz, Question, QuizAttempt, UserAnswer
+from flask import Blueprint, current_app, request, jsonify, abort, url_for
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from app.models import User, Subject, Chapter, Quiz, Question, QuizAttempt, UserAnswer, UserSubjectStats
 from app import db
 from datetime import datetime
-from sqlalchemy import func
-from ..cache import cache_response, clear_cache_for_user, clear_quiz_cache
+from sqlalchemy import func, insert, update
+from ..cache import cache_response, clear_cache_for_user
+from ..scoring import get_answer_key
+from ..stats import record_attempt_stats
+from ..submissions import enqueue_submission, get_submission_status
+from ..leaderboard import record_leaderboard_score, get_top_scores, get_user_standing, count_users
+from ..pagination import paginate, wants_pagination
+from ..serializers import USER_CATALOG, USER_QUIZ, build_tree, requested_levels, attempt_query, serialize_attempt, attempt_answers
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/subjects', methods=['GET'])
 @jwt_required()
-@cache_response(timeout=300)  # Cache for 5 minutes
+@cache_response(timeout=300, shared=True, local=True)  # Cache for 5 minutes, same for every user
 def get_subjects():
-    subjects = Subject.query.all()
-    return jsonify([{
-        'id': subject.id,
-        'name': subject.name,
-        'description': subject.description,
-        'chapters': [{
-            'id': chapter.id,
-            'name': chapter.name,
-            'quizzes': [{
-                'id': quiz.id,
-                'date_of_quiz': quiz.date_of_quiz.strftime('%Y-%m-%d %H:%M:%S'),
-                'duration': quiz.duration,
-                'remarks': quiz.remarks
-            } for quiz in chapter.quizzes]
-        } for chapter in subject.chapters]
-    } for subject in subjects]), 200
+    try:
+        levels = requested_levels(USER_CATALOG)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(build_tree(levels)), 200
 
 @user_bp.route('/quizzes/<int:quiz_id>', methods=['GET'])
 @jwt_required()
-@cache_response(timeout=300)  # Cache for 5 minutes
+@cache_response(timeout=300, shared=True, local=True)  # Cache for 5 minutes, same for every user
 def get_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
-    return jsonify({
-        'id': quiz.id,
-        'chapter_id': quiz.chapter_id,
-        'date_of_quiz': quiz.date_of_quiz.strftime('%Y-%m-%d %H:%M:%S'),
-        'duration': quiz.duration,
-        'remarks': quiz.remarks,
-        'questions': [{
-            'id': q.id,
-            'question_statement': q.question_statement,
-            'option1': q.option1,
-            'option2': q.option2,
-            'option3': q.option3,
-            'option4': q.option4,
-            'marks': q.marks
-        } for q in quiz.questions]
-    }), 200
+    quizzes = build_tree(USER_QUIZ, root_filter=Quiz.id == quiz_id)
+    if not quizzes:
+        abort(404)
+    return jsonify(quizzes[0]), 200
 
 @user_bp.route('/quizzes/<int:quiz_id>/attempt', methods=['POST'])
 @jwt_required()
 def attempt_quiz(quiz_id):
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
     
-    if user.is_blocked:
+    if get_jwt().get('is_blocked'):
         return jsonify({'error': 'Your account is blocked'}), 403
         
-    quiz = Quiz.query.get_or_404(quiz_id)
+    answer_key = get_answer_key(quiz_id)
+    if answer_key is None:
+        abort(404)
     data = request.get_json()
+    start_time = datetime.utcnow()
     
-    # Create quiz attempt
-    attempt = QuizAttempt(
-        user_id=user_id,
-        quiz_id=quiz_id,
-        start_time=datetime.utcnow(),
-        score=0  # Initialize with 0
-    )
-    db.session.add(attempt)
-    db.session.commit()  # Commit to get the attempt.id
+    question_ids = {answer_data['question_id'] for answer_data in data['answers']}
+    if not question_ids.issubset(answer_key):
+        return jsonify({'error': 'Invalid question ID'}), 400
     
-    # Calculate score
+    # Calculate score against the compiled answer key
     total_score = 0
     total_marks = 0
+    answer_rows = []
     
     for answer_data in data['answers']:
-        question = Question.query.get(answer_data['question_id'])
-        if not question or question.quiz_id != quiz_id:
-            return jsonify({'error': 'Invalid question ID'}), 400
-            
-        total_marks += question.marks
-        is_correct = answer_data['selected_option'] == question.correct_option
+        question_id = answer_data['question_id']
+        correct_option, marks = answer_key[question_id]
+        total_marks += marks
+        is_correct = answer_data['selected_option'] == correct_option
         if is_correct:
-            total_score += question.marks
-            
-        user_answer = UserAnswer(
-            attempt_id=attempt.id,
-            question_id=question.id,
-            selected_option=answer_data['selected_option'],
-            is_correct=is_correct
-        )
-        db.session.add(user_answer)
+            total_score += marks
+        answer_rows.append({
+            'question_id': question_id,
+            'selected_option': answer_data['selected_option'],
+            'is_correct': is_correct
+        })
     
-    attempt.score = total_score
-    attempt.end_time = datetime.utcnow()
+    # Exam bursts: hand the scored attempt to the batched writer instead of committing here
+    if current_app.config.get('SUBMISSION_MODE') == 'queued':
+        submission_id = enqueue_submission(user_id, quiz_id, total_score, start_time, datetime.utcnow(), answer_rows)
+        return jsonify({
+            'submission_id': submission_id,
+            'status': 'queued',
+            'status_url': url_for('user.get_submission', submission_id=submission_id),
+            'score': total_score,
+            'total_marks': total_marks
+        }), 202
+    
+    # Write the attempt and all of its answers in a single transaction
+    attempt = QuizAttempt(
+        user_id=user_id,
+        quiz_id=quiz_id,
+        start_time=start_time,
+        end_time=datetime.utcnow(),
+        score=total_score
+    )
+    db.session.add(attempt)
+    db.session.flush()  # Assigns attempt.id without committing
+    attempt_id = attempt.id
+    if answer_rows:
+        for row in answer_rows:
+            row['attempt_id'] = attempt_id
+        db.session.execute(insert(UserAnswer), answer_rows)
+    record_attempt_stats(user_id, quiz_id, total_score, start_time)
+    db.session.execute(update(User).where(User.id == user_id).values(last_attempt_at=start_time))
     db.session.commit()
     
-    # Clear cache for this quiz and user
-    clear_quiz_cache(quiz_id)
+    # Clear cache for this user; the quiz content itself is unchanged
     clear_cache_for_user(user_id)
+    record_leaderboard_score(quiz_id, user_id, total_score)
     
     return jsonify({
-        'attempt_id': attempt.id,
+        'attempt_id': attempt_id,
         'score': total_score,
         'total_marks': total_marks
     }), 201
 
+@user_bp.route('/submissions/<uuid:submission_id>', methods=['GET'])
+@jwt_required()
+def get_submission(submission_id):
+    user_id = get_jwt_identity()
+    submission_id = str(submission_id)
+    status = get_submission_status(submission_id)
+    if status is None:
+        # Status expired; the attempt table is authoritative once persisted
+        attempt_id = db.session.query(QuizAttempt.id).filter_by(
+            submission_id=submission_id, user_id=user_id
+        ).scalar()
+        if attempt_id is None:
+            abort(404)
+        status = {'status': 'persisted', 'user_id': user_id, 'attempt_id': attempt_id}
+    elif status['user_id'] != user_id:
+        abort(404)
+    
+    response = {'submission_id': submission_id, 'status': status['status']}
+    if 'attempt_id' in status:
+        response['attempt_id'] = status['attempt_id']
+    if 'error' in status:
+        response['error'] = status['error']
+    return jsonify(response), 200
+
+@user_bp.route('/quizzes/<int:quiz_id>/leaderboard', methods=['GET'])
+@jwt_required()
+def get_leaderboard(quiz_id):
+    user_id = get_jwt_identity()
+    if db.session.query(Quiz.id).filter_by(id=quiz_id).first() is None:
+        abort(404)
+    
+    default = current_app.config.get('LEADERBOARD_SIZE_DEFAULT', 10)
+    maximum = current_app.config.get('LEADERBOARD_SIZE_MAX', 100)
+    limit = max(1, min(request.args.get('limit', default, type=int), maximum))
+    
+    # Ranks come from the sorted set; only the names of the top users touch the database
+    top = get_top_scores(quiz_id, limit)
+    names = dict(
+        db.session.query(User.id, User.full_name).filter(User.id.in_([uid for _, uid, _ in top])).all()
+    ) if top else {}
+    standing = get_user_standing(quiz_id, user_id)
+    
+    return jsonify({
+        'quiz_id': quiz_id,
+        'total_users': count_users(quiz_id),
+        'top': [{
+            'rank': rank,
+            'user_id': uid,
+            'full_name': names.get(uid),
+            'score': score
+        } for rank, uid, score in top],
+        'me': {
+            'rank': standing[0],
+            'score': standing[1],
+            'percentile': standing[2]
+        } if standing else None
+    }), 200
+
 @user_bp.route('/attempts', methods=['GET'])
 @jwt_required()
 @cache_response(timeout=300)  # Cache for 5 minutes
 def get_attempts():
     user_id = get_jwt_identity()
-    attempts = QuizAttempt.query.filter_by(user_id=user_id).order_by(QuizAttempt.start_time.desc()).all()
-    return jsonify([{
-        'id': attempt.id,
-        'quiz_id': attempt.quiz_id,
-        'score': attempt.score,
-        'start_time': attempt.start_time.strftime('%Y-%m-%d %H:%M:%S'),
-        'end_time': attempt.end_time.strftime('%Y-%m-%d %H:%M:%S') if attempt.end_time else None,
-        'quiz': {
-            'chapter': attempt.quiz.chapter.name,
-            'subject': attempt.quiz.chapter.subject.name
-        }
-    } for attempt in attempts]), 200
+    query = attempt_query().filter(QuizAttempt.user_id == user_id)
+    
+    if not wants_pagination():
+        attempts = query.order_by(QuizAttempt.start_time.desc(), QuizAttempt.id.desc()).all()
+        return jsonify([serialize_attempt(attempt) for attempt in attempts]), 200
+    
+    try:
+        attempts, next_cursor = paginate(query, [QuizAttempt.start_time, QuizAttempt.id], descending=True)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    return jsonify({
+        'items': [serialize_attempt(attempt) for attempt in attempts],
+        'next_cursor': next_cursor
+    }), 200
 
 @user_bp.route('/attempts/<int:attempt_id>', methods=['GET'])
 @jwt_required()
 @cache_response(timeout=300)  # Cache for 5 minutes
 def get_attempt_details(attempt_id):
     user_id = get_jwt_identity()
-    attempt = QuizAttempt.query.filter_by(id=attempt_id, user_id=user_id).first_or_404()
-    return jsonify({
-        'id': attempt.id,
-        'quiz_id': attempt.quiz_id,
-        'score': attempt.score,
-        'start_time': attempt.start_time.strftime('%Y-%m-%d %H:%M:%S'),
-        'end_time': attempt.end_time.strftime('%Y-%m-%d %H:%M:%S') if attempt.end_time else None,
-        'quiz': {
-            'chapter': attempt.quiz.chapter.name,
-            'subject': attempt.quiz.chapter.subject.name
-        },
-        'answers': [{
-            'question_id': answer.question_id,
-            'selected_option': answer.selected_option,
-            'is_correct': answer.is_correct,
-            'question': {
-                'statement': answer.question.question_statement,
-                'correct_option': answer.question.correct_option,
-                'marks': answer.question.marks
-            }
-        } for answer in attempt.answers]
-    }), 200
+    attempt = attempt_query().filter(
+        QuizAttempt.id == attempt_id, QuizAttempt.user_id == user_id
+    ).first()
+    if attempt is None:
+        abort(404)
+    details = serialize_attempt(attempt)
+    details['answers'] = attempt_answers(attempt_id)
+    return jsonify(details), 200
 
 @user_bp.route('/stats', methods=['GET'])
 @jwt_required()
 @cache_response(timeout=300)  # Cache for 5 minutes
 def get_stats():
     user_id = get_jwt_identity()
-    attempts = QuizAttempt.query.filter_by(user_id=user_id).all()
     
-    if not attempts:
+    # Per-subject totals from the maintained stats table (primary key range on user_id)
+    rows = (
+        db.session.query(
+            Subject.name,
+            func.sum(UserSubjectStats.attempt_count),
+            func.sum(UserSubjectStats.score_sum)
+        )
+        .select_from(UserSubjectStats)
+        .join(Subject, UserSubjectStats.subject_id == Subject.id)
+        .filter(UserSubjectStats.user_id == user_id)
+        .group_by(Subject.name)
+        .all()
+    )
+    
+    if not rows:
         return jsonify({
             'total_attempts': 0,
             'average_score': 0,
@@ -170,34 +229,22 @@ def get_stats():
         })
     
     # Calculate overall statistics
-    total_attempts = len(attempts)
-    total_score = sum(attempt.score for attempt in attempts)
+    total_attempts = sum(attempts for _, attempts, _ in rows)
+    total_score = sum(score for _, _, score in rows)
     average_score = total_score / total_attempts
     
-    # Calculate subject-wise statistics
-    subject_stats = {}
-    for attempt in attempts:
-        subject_name = attempt.quiz.chapter.subject.name
-        if subject_name not in subject_stats:
-            subject_stats[subject_name] = {
-                'attempts': 0,
-                'total_score': 0
-            }
-        subject_stats[subject_name]['attempts'] += 1
-        subject_stats[subject_name]['total_score'] += attempt.score
-    
     # Format subject statistics
     subject_stats_list = [
         {
             'subject': subject,
-            'attempts': stats['attempts'],
-            'average_score': stats['total_score'] / stats['attempts']
+            'attempts': attempts,
+            'average_score': score / attempts
         }
-        for subject, stats in subject_stats.items()
+        for subject, attempts, score in rows
     ]
     
     return jsonify({
         'total_attempts': total_attempts,
         'average_score': average_score,
         'subject_stats': subject_stats_list
-    }) 
\ No newline at end of file
+    })
@@ -0,0 +1,14 @@
+import time
+
+def best_of(fn, repeat=5):
+    """Run fn `repeat` times and return (best wall time in seconds, last result)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def report(label, seconds, width=32):
+    print(f"{label:<{width}} {seconds * 1000:9.2f} ms")
@@ -0,0 +1,119 @@
+"""Row serializers (app.serializers) against the ORM to_dict() path, at 10k rows.
+
+Compares, on an in-memory SQLite database:
+
+  users     - the admin user listing: User.to_dict() vs serialize_user() rows
+  attempts  - attempts with chapter and subject names: joined ORM objects vs attempt_query() rows
+  catalog   - the admin catalog: Subject.to_dict() over selectinload vs build_tree(ADMIN_CATALOG)
+  json      - encoding that catalog, compact, with the stdlib provider vs OrjsonProvider (when orjson is installed)
+
+Each pair is checked to produce identical output before it is timed.
+
+Usage, from the repository root:
+
+    python -m benchmarks.serializers [--rows 10000] [--repeat 5]
+"""
+import argparse
+from datetime import datetime
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import insert, select
+from sqlalchemy.orm import joinedload, selectinload
+from app import create_app, db
+from app.models import User, Subject, Chapter, Quiz, Question, QuizAttempt
+from app.serializers import (
+    ADMIN_CATALOG, OrjsonProvider, attempt_query, build_tree, orjson, serialize_attempt, serialize_user, user_query
+)
+from .common import best_of, report
+
+def seed(rows):
+    now = datetime(2024, 1, 1, 9, 30)
+    db.session.execute(insert(User), [
+        {'email': f'user{i}@example.com', 'full_name': f'User {i}', 'created_at': now, 'is_admin': False, 'is_blocked': False}
+        for i in range(rows)
+    ])
+    user_id = db.session.scalar(select(User.id).limit(1))
+    subject_id = db.session.execute(insert(Subject).values(name='Maths', created_at=now)).inserted_primary_key[0]
+    chapter_id = db.session.execute(insert(Chapter).values(name='Algebra', subject_id=subject_id, created_at=now)).inserted_primary_key[0]
+    quizzes = max(rows // 100, 1)
+    db.session.execute(insert(Quiz), [
+        {'chapter_id': chapter_id, 'date_of_quiz': now, 'duration': 30, 'created_at': now} for _ in range(quizzes)
+    ])
+    quiz_ids = db.session.scalars(select(Quiz.id)).all()
+    db.session.execute(insert(Question), [
+        {'quiz_id': quiz_ids[i % quizzes], 'question_statement': 'Q', 'option1': 'a', 'option2': 'b', 'correct_option': 1, 'marks': 1}
+        for i in range(rows)
+    ])
+    db.session.execute(insert(QuizAttempt), [
+        {'user_id': user_id, 'quiz_id': quiz_ids[i % quizzes], 'score': 1, 'start_time': now, 'end_time': now}
+        for i in range(rows)
+    ])
+    db.session.commit()
+
+def orm_users():
+    return [user.to_dict() for user in User.query.order_by(User.id).all()]
+
+def row_users():
+    return [serialize_user(row) for row in user_query().order_by(User.id).all()]
+
+def orm_attempts():
+    attempts = QuizAttempt.query.options(
+        joinedload(QuizAttempt.quiz).joinedload(Quiz.chapter).joinedload(Chapter.subject)
+    ).order_by(QuizAttempt.id).all()
+    return [{
+        'id': attempt.id,
+        'quiz_id': attempt.quiz_id,
+        'score': attempt.score,
+        'start_time': attempt.start_time.strftime('%Y-%m-%d %H:%M:%S'),
+        'end_time': attempt.end_time.strftime('%Y-%m-%d %H:%M:%S') if attempt.end_time else None,
+        'quiz': {
+            'chapter': attempt.quiz.chapter.name,
+            'subject': attempt.quiz.chapter.subject.name
+        }
+    } for attempt in attempts]
+
+def row_attempts():
+    return [serialize_attempt(row) for row in attempt_query().order_by(QuizAttempt.id).all()]
+
+def orm_catalog():
+    subjects = Subject.query.options(
+        selectinload(Subject.chapters).selectinload(Chapter.quizzes).selectinload(Quiz.questions)
+    ).order_by(Subject.id).all()
+    return [subject.to_dict() for subject in subjects]
+
+def row_catalog():
+    return build_tree(ADMIN_CATALOG)
+
+def compare(label, before, after, repeat):
+    def fresh(fn):
+        # Time hydration too, not reads from the identity map
+        db.session.expunge_all()
+        return fn()
+
+    assert fresh(before) == fresh(after), f"{label}: outputs differ"
+    for name, fn in ((f"{label} before", before), (f"{label} after", after)):
+        seconds, _ = best_of(lambda: fresh(fn), repeat)
+        report(name, seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+        print(f"{args.rows} users, attempts and questions, best of {args.repeat}")
+        compare('users', orm_users, row_users, args.repeat)
+        compare('attempts', orm_attempts, row_attempts, args.repeat)
+        compare('catalog', orm_catalog, row_catalog, args.repeat)
+        if orjson is None:
+            print('json: orjson is not installed, skipped')
+            return
+        catalog = row_catalog()
+        stdlib, fast = DefaultJSONProvider(app), OrjsonProvider(app)
+        compare('json', lambda: stdlib.dumps(catalog, separators=(',', ':')), lambda: fast.dumps(catalog), args.repeat)
+
+if __name__ == '__main__':
+    main()
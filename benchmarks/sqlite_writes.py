@@ -0,0 +1,70 @@
+"""Concurrent write throughput on one SQLite file, with and without SQLITE_PRAGMAS.
+
+Several processes each commit single-row quiz_attempt inserts, the shape of a
+synchronous quiz submission, first with SQLite's defaults and then with the
+pragmas create_app applies (WAL journal, synchronous=NORMAL, busy_timeout,
+mmap_size).
+
+Usage, from the repository root:
+
+    python -m benchmarks.sqlite_writes [--workers 8] [--commits 300] [--path /tmp/bench.db]
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+from multiprocessing import Pool
+from sqlalchemy import create_engine, insert
+from app import configure_sqlite, db
+from app.models import QuizAttempt
+from config import Config
+
+def _remove(path):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def _reset(path):
+    _remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+def _worker(args):
+    """Commit `commits` attempts one by one; returns the number that failed"""
+    path, pragmas, commits = args
+    engine = create_engine(f"sqlite:///{path}")
+    configure_sqlite(engine, pragmas)
+    now = datetime.utcnow()
+    errors = 0
+    for i in range(commits):
+        try:
+            with engine.begin() as connection:
+                connection.execute(insert(QuizAttempt), {
+                    'user_id': os.getpid(), 'quiz_id': 1, 'score': i, 'start_time': now, 'end_time': now
+                })
+        except Exception:
+            errors += 1
+    engine.dispose()
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--commits', type=int, default=300, help='commits per worker')
+    parser.add_argument('--path', default='/tmp/quiz_master_bench.db')
+    args = parser.parse_args()
+
+    total = args.workers * args.commits
+    print(f"{args.workers} processes x {args.commits} commits")
+    for label, pragmas in (('default', {}), ('SQLITE_PRAGMAS', Config.SQLITE_PRAGMAS)):
+        _reset(args.path)
+        start = time.perf_counter()
+        with Pool(args.workers) as pool:
+            errors = sum(pool.map(_worker, [(args.path, pragmas, args.commits)] * args.workers))
+        elapsed = time.perf_counter() - start
+        print(f"{label:<16} {(total - errors) / elapsed:8.0f} commits/s   {errors} errors")
+    _remove(args.path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Worker start-up time: importing the app and running create_app().
+
+Each sample is a fresh interpreter, as a gunicorn or Celery worker would be, so
+import costs are included. Compared configurations:
+
+  development                   - create_all() and Flask-Migrate at start-up
+  production                    - neither (the schema comes from `flask db upgrade`)
+  production, ENABLE_MIGRATIONS - production with Flask-Migrate loaded
+
+Usage, from the repository root:
+
+    python -m benchmarks.startup [--runs 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT = "import sys; from app import create_app; create_app(sys.argv[1])"
+
+def _sample(config_name, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', SCRIPT, config_name], env=env, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, 'DATABASE_URL': f"sqlite:///{os.path.join(directory, 'startup.db')}"}
+        env.pop('FLASK_RUN_FROM_CLI', None)
+        env.pop('ENABLE_MIGRATIONS', None)
+        configurations = (
+            ('development', 'development', env),
+            ('production', 'production', env),
+            ('production, ENABLE_MIGRATIONS', 'production', {**env, 'ENABLE_MIGRATIONS': '1'})
+        )
+        # Warm the filesystem cache and bytecode so every configuration starts alike
+        _sample('development', env)
+        print(f"median of {args.runs} fresh interpreters")
+        for label, config_name, config_env in configurations:
+            samples = [_sample(config_name, config_env) for _ in range(args.runs)]
+            print(f"{label:<32} {statistics.median(samples) * 1000:9.1f} ms")
+
+if __name__ == '__main__':
+    main()
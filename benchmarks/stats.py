@@ -0,0 +1,108 @@
+"""/api/user/stats for a user with many attempts.
+
+Times the three ways the endpoint has computed its totals, on an in-memory
+SQLite database:
+
+  orm        - load every attempt with its quiz, chapter and subject and sum in Python
+  grouped    - one GROUP BY over quiz_attempt joined up to subject
+  stats      - the maintained user_subject_stats table (current implementation)
+
+Usage, from the repository root:
+
+    python -m benchmarks.stats [--attempts 10000] [--subjects 5] [--repeat 5]
+"""
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import joinedload
+from app import create_app, db
+from app.models import User, Subject, Chapter, Quiz, QuizAttempt, UserSubjectStats
+from app.stats import rebuild_user_subject_stats
+from .common import best_of, report
+
+def seed(attempts, subjects):
+    now = datetime(2024, 1, 1)
+    user = User(email='bench@example.com', full_name='Bench')
+    db.session.add(user)
+    db.session.flush()
+    db.session.execute(insert(Subject), [{'name': f'Subject {i}'} for i in range(subjects)])
+    subject_ids = db.session.scalars(select(Subject.id)).all()
+    db.session.execute(insert(Chapter), [
+        {'name': f'Chapter {i}', 'subject_id': subject_id}
+        for subject_id in subject_ids for i in range(4)
+    ])
+    chapter_ids = db.session.scalars(select(Chapter.id)).all()
+    db.session.execute(insert(Quiz), [
+        {'chapter_id': chapter_id, 'date_of_quiz': now, 'duration': 30} for chapter_id in chapter_ids
+    ])
+    quiz_ids = db.session.scalars(select(Quiz.id)).all()
+    db.session.execute(insert(QuizAttempt), [{
+        'user_id': user.id,
+        'quiz_id': quiz_ids[i % len(quiz_ids)],
+        'score': i % 7,
+        'start_time': now + timedelta(minutes=i),
+        'end_time': now + timedelta(minutes=i, seconds=30)
+    } for i in range(attempts)])
+    db.session.commit()
+    rebuild_user_subject_stats()
+    return user.id
+
+def orm_totals(user_id):
+    attempts = QuizAttempt.query.options(
+        joinedload(QuizAttempt.quiz).joinedload(Quiz.chapter).joinedload(Chapter.subject)
+    ).filter_by(user_id=user_id).all()
+    totals = {}
+    for attempt in attempts:
+        count, score = totals.get(attempt.quiz.chapter.subject.name, (0, 0))
+        totals[attempt.quiz.chapter.subject.name] = (count + 1, score + attempt.score)
+    return sorted((name, count, score) for name, (count, score) in totals.items())
+
+def grouped_totals(user_id):
+    rows = (
+        db.session.query(Subject.name, func.count(QuizAttempt.id), func.sum(QuizAttempt.score))
+        .select_from(QuizAttempt)
+        .join(Quiz, QuizAttempt.quiz_id == Quiz.id)
+        .join(Chapter, Quiz.chapter_id == Chapter.id)
+        .join(Subject, Chapter.subject_id == Subject.id)
+        .filter(QuizAttempt.user_id == user_id)
+        .group_by(Subject.name)
+    )
+    return sorted(tuple(row) for row in rows)
+
+def stats_totals(user_id):
+    rows = (
+        db.session.query(
+            Subject.name,
+            func.sum(UserSubjectStats.attempt_count),
+            func.sum(UserSubjectStats.score_sum)
+        )
+        .select_from(UserSubjectStats)
+        .join(Subject, UserSubjectStats.subject_id == Subject.id)
+        .filter(UserSubjectStats.user_id == user_id)
+        .group_by(Subject.name)
+    )
+    return sorted(tuple(row) for row in rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--attempts', type=int, default=10000)
+    parser.add_argument('--subjects', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        user_id = seed(args.attempts, args.subjects)
+        print(f"{args.attempts} attempts over {args.subjects} subjects, best of {args.repeat}")
+        expected = None
+        for label, totals in (('orm', orm_totals), ('grouped', grouped_totals), ('stats', stats_totals)):
+            seconds, result = best_of(lambda: totals(user_id), args.repeat)
+            db.session.expunge_all()
+            if expected is None:
+                expected = result
+            assert result == expected, f"{label} disagrees: {result} != {expected}"
+            report(label, seconds)
+
+if __name__ == '__main__':
+    main()
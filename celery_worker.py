@@ -0,0 +1,13 @@
+import os
+from dotenv import load_dotenv
+from app import create_app, celery
+
+# Entry point for Celery workers and beat: builds the Flask app so tasks get its
+# config, the broker and result backend, the beat schedule and an app context.
+#
+#   celery -A celery_worker.celery worker --loglevel=info
+#   celery -A celery_worker.celery beat --loglevel=info
+
+load_dotenv()
+
+app = create_app(os.getenv('FLASK_ENV', 'development'))
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -6,6 +7,20 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///quiz_master.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    AUTO_CREATE_TABLES = True  # Run db.create_all() at startup
+    ENABLE_MIGRATIONS = os.environ.get('ENABLE_MIGRATIONS', '1') == '1'  # Load Flask-Migrate outside the flask CLI
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': True,  # Drop dead connections before handing them out
+        'pool_recycle': 1800  # Seconds before a pooled connection is replaced
+    }
+    
+    # Applied to every new SQLite connection (ignored for other databases)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # Readers no longer block the writer
+        'synchronous': 'NORMAL',  # Safe with WAL, far fewer fsyncs
+        'busy_timeout': 5000,  # Milliseconds to wait for a lock instead of 'database is locked'
+        'mmap_size': 268435456  # 256 MB memory-mapped reads
+    }
     
     # JWT configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key')
@@ -17,25 +32,97 @@ class Config:
     MAIL_USE_TLS = True
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_BACKEND = os.environ.get('MAIL_BACKEND', 'smtp')  # smtp, file or memory
+    MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE', 100))  # messages per SMTP connection
+    MAIL_FILE_PATH = os.environ.get('MAIL_FILE_PATH', 'mail_outbox')  # used by the file backend
+    MAIL_CONNECT_ATTEMPTS = 3  # SMTP connection attempts before the remaining messages are failed
+    MAIL_RETRY_DELAY = 1  # seconds before the second connection attempt, doubled after each failure
+    
+    # Daily reminders go to users without an attempt in this many days
+    REMINDER_INACTIVITY_DAYS = int(os.environ.get('REMINDER_INACTIVITY_DAYS', 7))
     
     # Redis configuration
     REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
     
+    # Celery settings applied over app/celery_config.py (the result backend holds task state for polling and chords)
+    CELERY = {
+        'broker_url': os.environ.get('CELERY_BROKER_URL', REDIS_URL),
+        'result_backend': os.environ.get('CELERY_RESULT_BACKEND', REDIS_URL)
+    }
+    
     # Cache configuration
     CACHE_TYPE = 'redis'
     CACHE_REDIS_URL = REDIS_URL
     CACHE_DEFAULT_TIMEOUT = 300  # 5 minutes
+    
+    # In-process (L1) cache in front of Redis, per worker
+    LOCAL_CACHE_SIZE = int(os.environ.get('LOCAL_CACHE_SIZE', 512))  # entries
+    LOCAL_CACHE_TTL = int(os.environ.get('LOCAL_CACHE_TTL', 30))  # seconds
+    LOCAL_GENERATION_CACHE_SIZE = 1024  # content generation counters, kept apart from the entries
+    LOCAL_AUTH_CACHE_SIZE = int(os.environ.get('LOCAL_AUTH_CACHE_SIZE', 10000))  # per-user token generations
+    
+    # Cache stampede protection
+    CACHE_LOCK_TIMEOUT = 10  # seconds a worker may hold a recompute lock
+    CACHE_WAIT_TIMEOUT = 2  # seconds other workers wait for that result
+    CACHE_STALE_GRACE = 300  # seconds an expired entry may still be served
+    CACHE_EARLY_REFRESH_BETA = 1.0  # >1 refreshes earlier, 0 disables early refresh
+    
+    # Response compression (brotli is used when the brotli package is installed)
+    COMPRESS_MIN_SIZE = 1024  # bytes; smaller bodies are sent as is
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BR_QUALITY = 5
+    
+    # Cursor pagination for list endpoints
+    PAGE_SIZE_DEFAULT = 50
+    PAGE_SIZE_MAX = 500
+    
+    # Quiz submissions: 'sync' commits each attempt in the request, 'queued' scores
+    # it immediately and persists it through a batched Celery drain
+    SUBMISSION_MODE = os.environ.get('SUBMISSION_MODE', 'sync')
+    SUBMISSION_BATCH_SIZE = 500  # attempts per insert transaction
+    SUBMISSION_DRAIN_DELAY = 1  # seconds a burst is collected before draining
+    SUBMISSION_DRAIN_LOCK_TIMEOUT = 300  # seconds one drain may hold the queue
+    SUBMISSION_STATUS_TTL = 86400  # seconds submission statuses are kept
+    
+    # Quiz leaderboard size (?limit=) returned by /api/user/quizzes/<id>/leaderboard
+    LEADERBOARD_SIZE_DEFAULT = 10
+    LEADERBOARD_SIZE_MAX = 100
+    
+    # Directory holding finished export files served by /api/admin/exports
+    EXPORT_DIR = os.environ.get('EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'quiz_master_exports'))
+    EXPORT_RETENTION = 86400  # seconds export jobs and their files are kept
+    
+    # Compiled quiz answer keys used for scoring
+    ANSWER_KEY_TIMEOUT = 86400  # 1 day
 
 class DevelopmentConfig(Config):
     DEBUG = True
 
 class ProductionConfig(Config):
     DEBUG = False
+    # Migrations own the schema; skip create_all and the Alembic import on every worker boot
+    AUTO_CREATE_TABLES = False
+    ENABLE_MIGRATIONS = os.environ.get('ENABLE_MIGRATIONS', '0') == '1'
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': 30,
+        'pool_pre_ping': True,
+        'pool_recycle': 1800
+    }
 
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    # Tasks run in-process and store their results in memory
+    CELERY = {
+        'broker_url': 'memory://',
+        'result_backend': 'cache+memory://',
+        'task_always_eager': True,
+        'task_eager_propagates': True,
+        'task_store_eager_result': True
+    }
 
 config = {
     'development': DevelopmentConfig,
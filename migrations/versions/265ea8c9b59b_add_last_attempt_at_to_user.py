@@ -0,0 +1,36 @@
+"""Add last_attempt_at to User model
+
+Revision ID: 265ea8c9b59b
+Revises: 61f0f261a769
+Create Date: 2026-10-18 10:03:27.540916
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '265ea8c9b59b'
+down_revision = '61f0f261a769'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_attempt_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_user_last_attempt_at'), ['last_attempt_at'], unique=False)
+
+    # Backfill from the existing attempt history
+    op.execute("""
+        UPDATE "user" SET last_attempt_at = (
+            SELECT MAX(quiz_attempt.start_time) FROM quiz_attempt
+            WHERE quiz_attempt.user_id = "user".id
+        )
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_last_attempt_at'))
+        batch_op.drop_column('last_attempt_at')
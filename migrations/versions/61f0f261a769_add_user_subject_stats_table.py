@@ -0,0 +1,46 @@
+"""Add user_subject_stats table
+
+Revision ID: 61f0f261a769
+Revises: b50ca7923f06
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '61f0f261a769'
+down_revision = 'b50ca7923f06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_subject_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('subject_id', sa.Integer(), nullable=False),
+    sa.Column('attempt_count', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Float(), nullable=False),
+    sa.Column('best_score', sa.Float(), nullable=True),
+    sa.Column('last_attempt_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['subject_id'], ['subject.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'subject_id')
+    )
+
+    # Backfill from the existing attempt history
+    op.execute("""
+        INSERT INTO user_subject_stats
+            (user_id, subject_id, attempt_count, score_sum, best_score, last_attempt_at)
+        SELECT quiz_attempt.user_id, chapter.subject_id, COUNT(quiz_attempt.id),
+               SUM(quiz_attempt.score), MAX(quiz_attempt.score), MAX(quiz_attempt.start_time)
+        FROM quiz_attempt
+        JOIN quiz ON quiz_attempt.quiz_id = quiz.id
+        JOIN chapter ON quiz.chapter_id = chapter.id
+        GROUP BY quiz_attempt.user_id, chapter.subject_id
+    """)
+
+
+def downgrade():
+    op.drop_table('user_subject_stats')
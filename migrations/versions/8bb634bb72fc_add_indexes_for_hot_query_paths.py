@@ -0,0 +1,56 @@
+"""Add indexes for hot query paths
+
+Revision ID: 8bb634bb72fc
+Revises: 265ea8c9b59b
+Create Date: 2026-10-18 11:20:05.914377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8bb634bb72fc'
+down_revision = '265ea8c9b59b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chapter_subject_id'), ['subject_id'], unique=False)
+
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_quiz_chapter_id'), ['chapter_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_quiz_created_at'), ['created_at'], unique=False)
+
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_question_quiz_id'), ['quiz_id'], unique=False)
+
+    with op.batch_alter_table('quiz_attempt', schema=None) as batch_op:
+        batch_op.create_index('ix_quiz_attempt_user_id_start_time', ['user_id', 'start_time'], unique=False)
+        batch_op.create_index(batch_op.f('ix_quiz_attempt_quiz_id'), ['quiz_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_quiz_attempt_start_time'), ['start_time'], unique=False)
+
+    with op.batch_alter_table('user_answer', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_answer_attempt_id'), ['attempt_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_answer', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_answer_attempt_id'))
+
+    with op.batch_alter_table('quiz_attempt', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quiz_attempt_start_time'))
+        batch_op.drop_index(batch_op.f('ix_quiz_attempt_quiz_id'))
+        batch_op.drop_index('ix_quiz_attempt_user_id_start_time')
+
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_question_quiz_id'))
+
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quiz_created_at'))
+        batch_op.drop_index(batch_op.f('ix_quiz_chapter_id'))
+
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chapter_subject_id'))
@@ -1,7 +1,7 @@
 """Add is_blocked field to User model
 
 Revision ID: b50ca7923f06
-Revises: 
+Revises: c93365c4e98d
 Create Date: 2025-03-24 18:33:48.750005
 
 """
@@ -11,7 +11,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = 'b50ca7923f06'
-down_revision = None
+down_revision = 'c93365c4e98d'
 branch_labels = None
 depends_on = None
 
@@ -0,0 +1,28 @@
+"""Add submission_id to quiz_attempt
+
+Revision ID: ff66829d140e
+Revises: 8bb634bb72fc
+Create Date: 2026-10-18 14:02:37.418523
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ff66829d140e'
+down_revision = '8bb634bb72fc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('quiz_attempt', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('submission_id', sa.String(length=36), nullable=True))
+        batch_op.create_index(batch_op.f('ix_quiz_attempt_submission_id'), ['submission_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('quiz_attempt', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quiz_attempt_submission_id'))
+        batch_op.drop_column('submission_id')
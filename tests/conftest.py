@@ -0,0 +1,116 @@
+import contextlib
+import fakeredis
+import pytest
+import redis
+from sqlalchemy import event
+
+# Every Redis client the app creates (Flask-Caching, the invalidation and
+# leaderboard client) talks to one in-memory server, emptied between tests.
+_redis_server = fakeredis.FakeServer()
+
+def _fake_from_url(url, **kwargs):
+    kwargs.pop('db', None)
+    return fakeredis.FakeRedis(server=_redis_server, **kwargs)
+
+redis.from_url = _fake_from_url
+redis.Redis.from_url = staticmethod(_fake_from_url)
+
+from celery.contrib.testing.worker import start_worker
+from app import create_app, celery, db
+from app.models import User
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    fakeredis.FakeRedis(server=_redis_server).flushall()
+    from app.cache import local_cache, generation_cache, auth_generation_cache
+    for store in (local_cache, generation_cache, auth_generation_cache):
+        store.clear()
+
+@pytest.fixture
+def celery_worker(app):
+    """A real worker thread consuming the in-memory broker, with eager execution off"""
+    celery.conf.task_always_eager = False
+    try:
+        with start_worker(celery, pool='solo', perform_ping_check=False, shutdown_timeout=10) as worker:
+            yield worker
+    finally:
+        celery.conf.task_always_eager = True
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def _login(client, path, email):
+    response = client.post(path, json={'email': email, 'password': 'pw'})
+    assert response.status_code == 200, response.data
+    return {'Authorization': f"Bearer {response.json['access_token']}"}
+
+@pytest.fixture
+def users(app):
+    admin = User(email='admin@example.com', full_name='Admin', is_admin=True)
+    user = User(email='user@example.com', full_name='User')
+    for account in (admin, user):
+        account.set_password('pw')
+    db.session.add_all([admin, user])
+    db.session.commit()
+    return admin.id, user.id
+
+@pytest.fixture
+def admin_headers(client, users):
+    return _login(client, '/api/auth/admin/login', 'admin@example.com')
+
+@pytest.fixture
+def user_headers(client, users):
+    return _login(client, '/api/auth/login', 'user@example.com')
+
+@contextlib.contextmanager
+def recorded_statements():
+    """Collect (statement, parameters) of every query run inside the block"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+def seed_catalog(chapters, user_id=None, questions_per_quiz=2):
+    """Bulk-insert one subject with `chapters` chapters of one quiz each, plus an answered attempt per quiz for user_id"""
+    from datetime import datetime
+    from sqlalchemy import insert, select
+    from app.models import Subject, Chapter, Quiz, Question, QuizAttempt, UserAnswer
+    now = datetime(2024, 1, 1, 9, 30)
+    subject_id = db.session.execute(insert(Subject).values(name='Maths', created_at=now)).inserted_primary_key[0]
+    db.session.execute(insert(Chapter), [
+        {'name': f'Chapter {i}', 'subject_id': subject_id, 'created_at': now} for i in range(chapters)
+    ])
+    chapter_ids = db.session.scalars(select(Chapter.id).where(Chapter.subject_id == subject_id)).all()
+    db.session.execute(insert(Quiz), [
+        {'chapter_id': chapter_id, 'date_of_quiz': now, 'duration': 30, 'created_at': now} for chapter_id in chapter_ids
+    ])
+    quiz_ids = db.session.scalars(select(Quiz.id).where(Quiz.chapter_id.in_(chapter_ids))).all()
+    db.session.execute(insert(Question), [
+        {'quiz_id': quiz_id, 'question_statement': 'Q', 'option1': 'a', 'option2': 'b', 'correct_option': 1, 'marks': 1}
+        for quiz_id in quiz_ids for _ in range(questions_per_quiz)
+    ])
+    if user_id is not None:
+        db.session.execute(insert(QuizAttempt), [
+            {'user_id': user_id, 'quiz_id': quiz_id, 'score': 1, 'start_time': now, 'end_time': now} for quiz_id in quiz_ids
+        ])
+        attempts = db.session.execute(select(QuizAttempt.id, QuizAttempt.quiz_id).where(QuizAttempt.user_id == user_id)).all()
+        questions = dict(db.session.execute(select(Question.quiz_id, Question.id)).all())
+        db.session.execute(insert(UserAnswer), [
+            {'attempt_id': attempt_id, 'question_id': questions[quiz_id], 'selected_option': 1, 'is_correct': True}
+            for attempt_id, quiz_id in attempts
+        ])
+    db.session.commit()
+    return quiz_ids
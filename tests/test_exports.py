@@ -0,0 +1,81 @@
+import gzip
+import os
+import time
+import uuid
+import pytest
+from app import celery, tasks
+from app.exports import export_path, remove_expired_exports
+from .conftest import seed_catalog
+
+@pytest.fixture
+def export_dir(app, tmp_path):
+    app.config['EXPORT_DIR'] = str(tmp_path)
+    return tmp_path
+
+def _fail_writes(monkeypatch):
+    def failing_write(path, user_id=None, progress=None):
+        with gzip.open(path, 'wt') as output:
+            output.write('User,Subject\n')
+        raise RuntimeError('database went away')
+    monkeypatch.setattr(tasks, 'write_attempts_csv', failing_write)
+
+def test_unknown_job_is_not_found(client, admin_headers, export_dir):
+    job_id = uuid.uuid4()
+    assert client.get(f'/api/admin/exports/{job_id}', headers=admin_headers).status_code == 404
+    # A file without a recorded job is not served either
+    (export_dir / f'{job_id}.csv.gz').write_bytes(b'')
+    assert client.get(f'/api/admin/exports/{job_id}/download', headers=admin_headers).status_code == 404
+
+def test_finished_job_can_be_polled_and_downloaded(client, users, admin_headers, export_dir):
+    _, user_id = users
+    seed_catalog(3, user_id=user_id)
+    # Tasks run eagerly in tests and store their state in the in-memory result backend
+    response = client.post('/api/admin/exports', headers=admin_headers)
+    assert response.status_code == 202
+
+    response = client.get(response.json['status_url'], headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json['state'] == 'SUCCESS'
+    assert response.json['rows_written'] == response.json['total'] == 3
+
+    response = client.get(response.json['download_url'], headers=admin_headers)
+    assert response.status_code == 200
+    assert gzip.decompress(response.data).decode().splitlines()[0] == 'User,Subject,Chapter,Score,Date'
+
+def test_failed_job_reports_failure(client, admin_headers, export_dir, monkeypatch):
+    _fail_writes(monkeypatch)
+    monkeypatch.setattr(celery.conf, 'task_eager_propagates', False)
+    response = client.post('/api/admin/exports', headers=admin_headers)
+    response = client.get(response.json['status_url'], headers=admin_headers)
+    assert response.json['state'] == 'FAILURE'
+    assert response.json['error'] == 'database went away'
+    assert os.listdir(export_dir) == []
+
+def test_failed_job_removes_partial_file(app, export_dir, monkeypatch):
+    _fail_writes(monkeypatch)
+    path = export_path(uuid.uuid4())
+    with pytest.raises(RuntimeError):
+        tasks.run_export_job.apply(args=[path])
+    assert os.listdir(export_dir) == []
+
+def test_worker_runs_tasks_in_an_app_context(app, export_dir, celery_worker):
+    old = export_dir / 'old.csv.gz'
+    old.write_bytes(b'')
+    os.utime(old, (0, 0))
+    assert tasks.clean_exports.delay().get(timeout=10) == {'removed': 1}
+
+def test_cleanup_is_scheduled():
+    assert celery.conf.beat_schedule['clean-exports']['task'] == 'app.tasks.clean_exports'
+
+def test_remove_expired_exports(app, export_dir):
+    app.config['EXPORT_RETENTION'] = 3600
+    expired = [export_dir / 'old.csv.gz', export_dir / 'crashed.csv.gz.part']
+    kept = [export_dir / 'new.csv.gz', export_dir / 'running.csv.gz.part', export_dir / 'notes.txt']
+    for path in expired + kept:
+        path.write_bytes(b'')
+    old = time.time() - 7200
+    for path in expired + [export_dir / 'notes.txt']:
+        os.utime(path, (old, old))
+
+    assert remove_expired_exports() == 2
+    assert sorted(os.listdir(export_dir)) == sorted(path.name for path in kept)
@@ -0,0 +1,121 @@
+import gzip
+import sys
+import pytest
+from flask import Response, jsonify
+from app import compression
+from .conftest import seed_catalog
+
+cache_module = sys.modules['app.cache']
+brotli = compression.brotli
+needs_brotli = pytest.mark.skipif(brotli is None, reason='brotli is not installed')
+
+@pytest.fixture
+def catalog(app, users):
+    """A catalog listing for the user, large enough to be compressed"""
+    _, user_id = users
+    seed_catalog(30, user_id=user_id)
+
+def _get(client, path, headers, accept=None, etag=None):
+    headers = dict(headers)
+    if accept:
+        headers['Accept-Encoding'] = accept
+    if etag:
+        headers['If-None-Match'] = etag
+    return client.get(path, headers=headers)
+
+def test_uncompressed_response_has_a_strong_tag(client, user_headers, catalog):
+    response = _get(client, '/api/user/subjects', user_headers)
+
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+    etag, weak = response.get_etag()
+    assert etag and not weak
+
+    revalidated = _get(client, '/api/user/subjects', user_headers, etag=response.headers['ETag'])
+    assert revalidated.status_code == 304
+    assert revalidated.get_etag() == (etag, False)
+    assert 'Accept-Encoding' in revalidated.vary
+
+def test_changed_content_gets_a_new_tag(client, admin_headers, user_headers, catalog):
+    before = _get(client, '/api/user/subjects', user_headers)
+    response = client.post('/api/admin/subjects', json={'name': 'Physics'}, headers=admin_headers)
+    assert response.status_code == 201, response.data
+
+    after = _get(client, '/api/user/subjects', user_headers, etag=before.headers['ETag'])
+    assert after.status_code == 200
+    assert after.get_etag() != before.get_etag()
+
+@pytest.mark.parametrize('accept, encoding, decompress', [
+    ('gzip', 'gzip', gzip.decompress),
+    pytest.param('br, gzip;q=0.8', 'br', brotli and brotli.decompress, marks=needs_brotli)
+])
+def test_compressed_response_has_a_weak_tag(client, user_headers, catalog, accept, encoding, decompress):
+    plain = _get(client, '/api/user/subjects', user_headers)
+    response = _get(client, '/api/user/subjects', user_headers, accept=accept)
+
+    assert response.headers['Content-Encoding'] == encoding
+    assert 'Accept-Encoding' in response.vary
+    assert decompress(response.get_data()) == plain.get_data()
+    # Same opaque tag as the identity body, sent weak
+    assert response.get_etag() == (plain.get_etag()[0], True)
+
+    revalidated = _get(client, '/api/user/subjects', user_headers, accept=accept, etag=response.headers['ETag'])
+    assert revalidated.status_code == 304
+    assert revalidated.get_etag() == (plain.get_etag()[0], True)
+
+def test_refused_encoding_is_not_used(client, user_headers, catalog):
+    response = _get(client, '/api/user/subjects', user_headers, accept='br;q=0, gzip;q=0')
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+
+@pytest.mark.parametrize('path', ['/api/user/subjects', '/api/user/attempts'])
+def test_cache_hit_serves_stored_variants(client, user_headers, catalog, monkeypatch, path):
+    # Miss: the view runs and every variant is compressed once
+    first = _get(client, path, user_headers, accept='gzip')
+    assert first.headers['Content-Encoding'] == 'gzip'
+
+    def no_compression(body, encoding):
+        raise AssertionError('cache hit compressed again')
+
+    monkeypatch.setattr(cache_module, 'compress', no_compression)
+    monkeypatch.setattr(compression, 'compress', no_compression)
+
+    gzipped = _get(client, path, user_headers, accept='gzip')
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzipped.get_data() == first.get_data()
+    assert gzipped.get_etag() == first.get_etag()
+
+    if brotli is not None:
+        brotlied = _get(client, path, user_headers, accept='br')
+        assert brotlied.headers['Content-Encoding'] == 'br'
+        assert brotli.decompress(brotlied.get_data()) == gzip.decompress(first.get_data())
+
+def test_small_bodies_are_sent_as_is(app, client, users, user_headers):
+    response = _get(client, '/api/user/attempts', user_headers, accept='gzip')
+    assert len(response.get_data()) < app.config['COMPRESS_MIN_SIZE']
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+    assert not response.get_etag()[1]
+
+def test_uncached_response_is_compressed_on_the_way_out(app):
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = jsonify(['x' * 10] * 200)
+        response.set_etag('abc')
+        body = response.get_data()
+        response = compression.compress_response(response)
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(response.get_data()) == body
+        assert response.get_etag() == ('abc', True)
+        assert 'Accept-Encoding' in response.vary
+
+        # Already encoded bodies are left alone
+        again = compression.compress_response(response)
+        assert gzip.decompress(again.get_data()) == body
+
+def test_other_mimetypes_are_not_compressed(app):
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = compression.compress_response(Response(b'\0' * 4096, mimetype='application/octet-stream'))
+        assert 'Content-Encoding' not in response.headers
+        assert 'Accept-Encoding' not in response.vary
@@ -0,0 +1,109 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import insert
+from app import db, leaderboard
+from app.models import QuizAttempt, User
+from .conftest import seed_catalog
+
+@pytest.fixture
+def client(app):
+    # The Redis client behind the leaderboards, not the Flask test client
+    return leaderboard.get_redis_client()
+
+def _record(quiz_id, scores):
+    for user_id, score in scores.items():
+        leaderboard.record_leaderboard_score(quiz_id, user_id, score)
+
+def test_tied_users_share_a_rank(client):
+    _record(1, {10: 90, 11: 80, 12: 80, 13: 70})
+
+    assert leaderboard.get_top_scores(1, 10) == [(1, 10, 90), (2, 12, 80), (2, 11, 80), (4, 13, 70)]
+    assert leaderboard.get_user_standing(1, 11)[0] == 2
+    assert leaderboard.get_user_standing(1, 12)[0] == 2
+    assert leaderboard.get_user_standing(1, 13)[0] == 4
+
+def test_top_scores_stop_at_the_limit(client):
+    _record(1, {10: 90, 11: 80, 12: 80, 13: 70})
+    assert leaderboard.get_top_scores(1, 2) == [(1, 10, 90), (2, 12, 80)]
+    assert leaderboard.get_top_scores(2, 5) == []
+
+def test_standing_percentile(client):
+    _record(1, {10: 90, 11: 80, 12: 80, 13: 70})
+
+    assert leaderboard.get_user_standing(1, 10) == (1, 90, 100.0)
+    assert leaderboard.get_user_standing(1, 11) == (2, 80, 75.0)
+    assert leaderboard.get_user_standing(1, 13) == (4, 70, 25.0)
+    assert leaderboard.get_user_standing(1, 14) is None
+    assert leaderboard.count_users(1) == 4
+
+def test_lower_scores_do_not_replace_the_best(client):
+    leaderboard.record_leaderboard_score(1, 10, 80)
+    leaderboard.record_leaderboard_score(1, 10, 60)
+    assert leaderboard.get_user_standing(1, 10)[1] == 80
+
+    leaderboard.record_leaderboard_score(1, 10, 95)
+    assert leaderboard.get_user_standing(1, 10)[1] == 95
+    assert leaderboard.count_users(1) == 1
+
+@pytest.fixture
+def attempts(app, users):
+    """Two quizzes with attempts; returns (quiz_ids, user_id, other_id)"""
+    _, user_id = users
+    other = User(email='other@example.com', full_name='Other')
+    other.set_password('pw')
+    db.session.add(other)
+    db.session.commit()
+    quiz_ids = seed_catalog(2)
+    now = datetime(2024, 1, 1, 9, 30)
+    db.session.execute(insert(QuizAttempt), [
+        {'user_id': user_id, 'quiz_id': quiz_ids[0], 'score': score, 'start_time': now, 'end_time': now}
+        for score in (3, 7, 5)
+    ] + [
+        {'user_id': other.id, 'quiz_id': quiz_ids[0], 'score': 4, 'start_time': now, 'end_time': now},
+        {'user_id': other.id, 'quiz_id': quiz_ids[1], 'score': 2, 'start_time': now, 'end_time': now}
+    ])
+    db.session.commit()
+    return quiz_ids, user_id, other.id
+
+def _keys(client):
+    return sorted(key.decode() for key in client.scan_iter(match='leaderboard_*'))
+
+def test_rebuild_replaces_leaderboards_from_attempts(client, attempts):
+    (first, second), user_id, other_id = attempts
+    # A score that never happened and a quiz whose attempts are all gone
+    _record(first, {user_id: 100})
+    _record(999, {user_id: 1})
+
+    assert leaderboard.rebuild_leaderboards() == 2
+
+    assert leaderboard.get_top_scores(first, 10) == [(1, user_id, 7), (2, other_id, 4)]
+    assert leaderboard.get_top_scores(second, 10) == [(1, other_id, 2)]
+    assert _keys(client) == sorted([f'leaderboard_{first}', f'leaderboard_{second}'])
+
+def test_rebuild_of_one_quiz_leaves_the_others(client, attempts):
+    (first, second), user_id, other_id = attempts
+    _record(first, {user_id: 100})
+    _record(second, {user_id: 50})
+
+    assert leaderboard.rebuild_leaderboards(first) == 1
+
+    assert leaderboard.get_top_scores(first, 10) == [(1, user_id, 7), (2, other_id, 4)]
+    assert leaderboard.get_top_scores(second, 10) == [(1, user_id, 50)]
+    assert not any(key.endswith('_rebuild') for key in _keys(client))
+
+def test_rebuild_of_a_quiz_without_attempts_removes_its_leaderboard(client, attempts):
+    (first, _), user_id, _ = attempts
+    _record(999, {user_id: 1})
+
+    assert leaderboard.rebuild_leaderboards(999) == 0
+
+    assert leaderboard.count_users(999) == 0
+    assert f'leaderboard_{first}' not in _keys(client)
+
+def test_rebuild_in_chunks(client, attempts, monkeypatch):
+    (first, second), user_id, other_id = attempts
+    monkeypatch.setattr(leaderboard, 'REBUILD_CHUNK_SIZE', 1)
+
+    assert leaderboard.rebuild_leaderboards() == 2
+    assert leaderboard.get_top_scores(first, 10) == [(1, user_id, 7), (2, other_id, 4)]
+    assert leaderboard.get_top_scores(second, 10) == [(1, other_id, 2)]
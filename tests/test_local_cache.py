@@ -0,0 +1,20 @@
+from app.auth.utils import check_token_revoked, revoke_user_tokens
+from app.cache import local_cache, auth_generation_cache
+
+def test_auth_generations_do_not_evict_shared_entries(app, client, user_headers):
+    assert client.get('/api/user/subjects', headers=user_headers).status_code == 200
+    cached = dict(local_cache._data)
+    assert cached
+
+    # Token checks of more active users than the payload LRU holds
+    for user_id in range(1, local_cache.maxsize + 100):
+        assert not check_token_revoked({}, {'sub': user_id, 'auth_gen': 0})
+
+    assert dict(local_cache._data).keys() == cached.keys()
+    assert len(auth_generation_cache._data) == local_cache.maxsize + 99
+
+def test_revoked_token_is_rejected(app, client, users, user_headers):
+    _, user_id = users
+    assert client.get('/api/user/subjects', headers=user_headers).status_code == 200
+    revoke_user_tokens(user_id)
+    assert client.get('/api/user/subjects', headers=user_headers).status_code == 401
@@ -0,0 +1,80 @@
+import smtplib
+import pytest
+from flask_mail import Message
+from app import mailer
+
+def _messages(count):
+    return [Message('Hello', sender='quiz@example.com', recipients=[f'user{i}@example.com']) for i in range(count)]
+
+@pytest.fixture
+def smtp(app, monkeypatch):
+    app.config.update(MAIL_BACKEND='smtp', MAIL_CONNECT_ATTEMPTS=3, MAIL_RETRY_DELAY=1)
+    sleeps = []
+    monkeypatch.setattr(mailer.time, 'sleep', sleeps.append)
+    return sleeps
+
+class FakeConnection:
+    def __init__(self, sent, drop_after=None):
+        self.sent = sent
+        self.drop_after = drop_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def send(self, message):
+        if self.drop_after is not None and len(self.sent) == self.drop_after:
+            self.drop_after = None
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        self.sent.append(message)
+
+def test_unreachable_server_fails_the_rest_without_reconnecting(smtp, monkeypatch):
+    connects = []
+
+    def refuse():
+        connects.append(1)
+        raise ConnectionRefusedError('Connection refused')
+
+    monkeypatch.setattr(mailer.mail, 'connect', refuse)
+    messages = _messages(250)
+    failures = mailer.send_messages(messages, batch_size=100)
+
+    assert len(connects) == 3
+    assert smtp == [1, 2]
+    assert [message for message, _ in failures] == messages
+    assert all(isinstance(error, ConnectionRefusedError) for _, error in failures)
+
+def test_authentication_error_is_a_connect_failure(smtp, monkeypatch):
+    def reject():
+        raise smtplib.SMTPAuthenticationError(535, b'Bad credentials')
+
+    monkeypatch.setattr(mailer.mail, 'connect', reject)
+    failures = mailer.send_messages(_messages(3))
+    assert len(failures) == 3
+
+def test_dropped_connection_is_reopened(smtp, monkeypatch):
+    sent = []
+    connections = [FakeConnection(sent, drop_after=2), FakeConnection(sent)]
+    monkeypatch.setattr(mailer.mail, 'connect', lambda: connections.pop(0))
+    messages = _messages(5)
+
+    assert mailer.send_messages(messages) == []
+    assert sent == messages
+    assert smtp == []
+
+def test_connect_failures_reset_after_a_connection(smtp, monkeypatch):
+    sent = []
+    attempts = [ConnectionRefusedError(), ConnectionRefusedError(), FakeConnection(sent)] * 2
+
+    def connect():
+        attempt = attempts.pop(0)
+        if isinstance(attempt, Exception):
+            raise attempt
+        return attempt
+
+    monkeypatch.setattr(mailer.mail, 'connect', connect)
+    messages = _messages(4)
+    assert mailer.send_messages(messages, batch_size=2) == []
+    assert sent == messages
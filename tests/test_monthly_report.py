@@ -0,0 +1,73 @@
+import pytest
+from app import db, mailer, tasks
+from app.models import QuizAttempt, User
+from .conftest import seed_catalog
+
+def _last_month_attempts(user_id):
+    month_start, _ = tasks._previous_month()
+    seed_catalog(3, user_id=user_id)
+    db.session.query(QuizAttempt).update({QuizAttempt.start_time: month_start})
+    db.session.commit()
+    return month_start
+
+def test_chunk_reports_users_as_failed_when_sending_raises(app, users, monkeypatch):
+    _, user_id = users
+    month_start = _last_month_attempts(user_id)
+
+    def unreachable(messages, batch_size=None):
+        raise ConnectionRefusedError('mail server down')
+
+    monkeypatch.setattr(tasks, 'send_messages', unreachable)
+    result = tasks.send_monthly_report_chunk.apply(args=[[[user_id, 3, 3]], month_start.isoformat()]).get()
+    assert result == {'sent': 0, 'failed': [user_id]}
+
+def test_chunk_sends_reports(app, users, monkeypatch):
+    _, user_id = users
+    month_start = _last_month_attempts(user_id)
+    sent = []
+    monkeypatch.setattr(tasks, 'send_messages', lambda messages, batch_size=None: sent.extend(messages) or [])
+    result = tasks.send_monthly_report_chunk.apply(args=[[[user_id, 3, 3]], month_start.isoformat()]).get()
+    assert result == {'sent': 1, 'failed': []}
+    assert sent[0].recipients == ['user@example.com']
+
+@pytest.fixture
+def second_user(users):
+    user = User(email='other@example.com', full_name='Other')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+def test_monthly_report_runs_a_real_chord(app, users, second_user, monkeypatch):
+    _, user_id = users
+    _last_month_attempts(user_id)
+    db.session.add(QuizAttempt(user_id=second_user, quiz_id=1, score=2, start_time=tasks._previous_month()[0]))
+    db.session.commit()
+    app.config['MAIL_BACKEND'] = 'memory'
+    monkeypatch.setattr(tasks, 'REPORT_CHUNK_SIZE', 1)
+    mailer.outbox.clear()
+
+    # Eager in tests: the chunks and the callback run in-process through the result backend
+    chord_id = tasks.send_monthly_report.apply().get()
+    summary = tasks.summarize_monthly_report.AsyncResult(chord_id).get(timeout=10)
+    assert summary == {'chunks': 2, 'sent': 2, 'failed': []}
+    assert sorted(message.recipients[0] for message in mailer.outbox) == ['other@example.com', 'user@example.com']
+
+def test_failed_chunk_still_reaches_the_summary(app, users, second_user, monkeypatch):
+    _, user_id = users
+    _last_month_attempts(user_id)
+    db.session.add(QuizAttempt(user_id=second_user, quiz_id=1, score=2, start_time=tasks._previous_month()[0]))
+    db.session.commit()
+    app.config['MAIL_BACKEND'] = 'memory'
+    monkeypatch.setattr(tasks, 'REPORT_CHUNK_SIZE', 1)
+    send_messages = tasks.send_messages
+
+    def unreachable_for_other(messages, batch_size=None):
+        messages = list(messages)
+        if any(message.recipients == ['other@example.com'] for message in messages):
+            raise ConnectionRefusedError('mail server down')
+        return send_messages(messages, batch_size)
+
+    monkeypatch.setattr(tasks, 'send_messages', unreachable_for_other)
+    chord_id = tasks.send_monthly_report.apply().get()
+    summary = tasks.summarize_monthly_report.AsyncResult(chord_id).get(timeout=10)
+    assert summary == {'chunks': 2, 'sent': 1, 'failed': [second_user]}
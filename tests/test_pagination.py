@@ -0,0 +1,82 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import insert, update
+import pytest
+from app import db
+from app.models import QuizAttempt, User
+from .conftest import seed_catalog
+
+def _walk(client, path, headers, limit):
+    """Follow next_cursor from the first page to the last; returns the pages"""
+    pages = []
+    response = client.get(f'{path}?limit={limit}', headers=headers)
+    while True:
+        assert response.status_code == 200, response.data
+        pages.append(response.json['items'])
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            return pages
+        response = client.get(f'{path}?limit={limit}&cursor={cursor}', headers=headers)
+
+def test_attempt_pages_cover_tied_start_times(client, users, user_headers):
+    _, user_id = users
+    seed_catalog(11, user_id=user_id)
+    # Every seeded attempt starts at the same time; move two apart so the pages
+    # cross both tied and distinct start times
+    ids = sorted(db.session.scalars(db.select(QuizAttempt.id)).all())
+    db.session.execute(update(QuizAttempt).where(QuizAttempt.id == ids[3]).values(start_time=datetime(2024, 2, 1)))
+    db.session.execute(update(QuizAttempt).where(QuizAttempt.id == ids[7]).values(start_time=datetime(2023, 12, 1)))
+    db.session.commit()
+
+    pages = _walk(client, '/api/user/attempts', user_headers, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 3, 2]
+    walked = [attempt['id'] for page in pages for attempt in page]
+    tied = sorted((i for i in ids if i not in (ids[3], ids[7])), reverse=True)
+    assert walked == [ids[3]] + tied + [ids[7]]
+
+def test_attempt_pages_match_the_full_list(client, users, user_headers):
+    _, user_id = users
+    seed_catalog(7, user_id=user_id)
+
+    pages = _walk(client, '/api/user/attempts', user_headers, limit=2)
+    full = client.get('/api/user/attempts', headers=user_headers)
+
+    assert isinstance(full.json, list)
+    assert [attempt for page in pages for attempt in page] == full.json
+
+def test_user_pages_cover_every_student(client, users, admin_headers):
+    db.session.execute(insert(User), [{'email': f'student{i}@example.com', 'full_name': 'Student'} for i in range(6)])
+    db.session.commit()
+
+    pages = _walk(client, '/api/admin/users', admin_headers, limit=4)
+
+    assert [len(page) for page in pages] == [4, 3]
+    walked = [user['id'] for page in pages for user in page]
+    assert walked == sorted(db.session.scalars(db.select(User.id).where(User.is_admin == False)).all())
+
+def test_pagination_is_opt_in(client, users, admin_headers, user_headers):
+    _, user_id = users
+    seed_catalog(2, user_id=user_id)
+
+    assert isinstance(client.get('/api/user/attempts', headers=user_headers).json, list)
+    assert isinstance(client.get('/api/admin/users', headers=admin_headers).json, list)
+    assert isinstance(client.get('/api/user/attempts?paginate=false', headers=user_headers).json, list)
+    page = client.get('/api/user/attempts?paginate=true', headers=user_headers).json
+    assert len(page['items']) == 2 and page['next_cursor'] is None
+
+def _encoded(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+@pytest.mark.parametrize('cursor', ['garbage', _encoded({'id': 1}), _encoded([1, 2, 3]), _encoded(['yesterday', 1])])
+def test_malformed_attempt_cursor_is_rejected(client, users, user_headers, cursor):
+    response = client.get(f'/api/user/attempts?cursor={cursor}', headers=user_headers)
+    assert response.status_code == 400
+    assert response.json == {'error': 'Invalid cursor'}
+
+@pytest.mark.parametrize('cursor', ['garbage', _encoded([1, 2])])
+def test_malformed_user_cursor_is_rejected(client, users, admin_headers, cursor):
+    response = client.get(f'/api/admin/users?cursor={cursor}', headers=admin_headers)
+    assert response.status_code == 400
+    assert response.json == {'error': 'Invalid cursor'}
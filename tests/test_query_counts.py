@@ -0,0 +1,79 @@
+import sys
+import pytest
+from app import db
+from app.models import QuizAttempt, Quiz
+from app.serializers import (
+    ADMIN_CATALOG, ADMIN_QUIZ, USER_CATALOG, USER_QUIZ,
+    attempt_answers, attempt_query, build_tree
+)
+from .conftest import recorded_statements, seed_catalog
+
+# The list endpoints must run a fixed number of statements however large the
+# catalog is (no per-row lazy loads). Each measurement is taken at 10 and at
+# 1000 chapters and the two must match.
+
+def _count(run):
+    db.session.expunge_all()
+    with recorded_statements() as statements:
+        assert run()
+    return len(statements)
+
+def _serializer_counts(user_id, quiz_id, attempt_id):
+    return {
+        'admin catalog': _count(lambda: build_tree(ADMIN_CATALOG)),
+        'user catalog': _count(lambda: build_tree(USER_CATALOG)),
+        'admin quiz': _count(lambda: build_tree(ADMIN_QUIZ, root_filter=Quiz.id == quiz_id)),
+        'user quiz': _count(lambda: build_tree(USER_QUIZ, root_filter=Quiz.id == quiz_id)),
+        'attempts': _count(lambda: attempt_query().filter(QuizAttempt.user_id == user_id).all()),
+        'attempt answers': _count(lambda: attempt_answers(attempt_id))
+    }
+
+def _route_counts(client, admin_headers, user_headers, quiz_id, attempt_id):
+    routes = [
+        ('/api/admin/subjects', admin_headers),
+        (f'/api/admin/quizzes/{quiz_id}', admin_headers),
+        ('/api/admin/users', admin_headers),
+        ('/api/user/subjects', user_headers),
+        (f'/api/user/quizzes/{quiz_id}', user_headers),
+        ('/api/user/attempts?paginate=true', user_headers),
+        ('/api/user/attempts?paginate=false', user_headers),
+        (f'/api/user/attempts/{attempt_id}', user_headers),
+        ('/api/user/stats', user_headers)
+    ]
+    # Measure cache misses only
+    redis_client = sys.modules['app.cache'].get_redis_client()
+    redis_client.flushall()
+    sys.modules['app.cache'].local_cache.clear()
+    counts = {}
+    for path, headers in routes:
+        with recorded_statements() as statements:
+            assert client.get(path, headers=headers).status_code == 200
+        counts[path.replace(str(quiz_id), '<id>').replace(str(attempt_id), '<id>')] = len(statements)
+    return counts
+
+@pytest.fixture
+def measure(client, users, admin_headers, user_headers):
+    _, user_id = users
+
+    def measure(chapters):
+        quiz_ids = seed_catalog(chapters, user_id=user_id)
+        attempt_id = db.session.query(QuizAttempt.id).filter_by(quiz_id=quiz_ids[0]).scalar()
+        return (
+            _serializer_counts(user_id, quiz_ids[0], attempt_id),
+            _route_counts(client, admin_headers, user_headers, quiz_ids[0], attempt_id)
+        )
+    return measure
+
+def test_query_count_does_not_grow_with_the_catalog(measure):
+    small_serializers, small_routes = measure(10)
+    large_serializers, large_routes = measure(1000)
+    assert large_serializers == small_serializers
+    assert large_routes == small_routes
+    assert large_serializers == {
+        'admin catalog': 4,
+        'user catalog': 3,
+        'admin quiz': 2,
+        'user quiz': 2,
+        'attempts': 1,
+        'attempt answers': 1
+    }
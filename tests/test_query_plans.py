@@ -0,0 +1,91 @@
+import re
+import sys
+import pytest
+from app import db
+from sqlalchemy import insert
+from app.models import QuizAttempt, User
+from .conftest import recorded_statements, seed_catalog
+
+# Every query a route runs is checked with EXPLAIN QUERY PLAN and must reach its
+# rows through an index. Full table scans are only expected where the route
+# returns the whole table, listed here per route.
+EXPECTED_SCANS = {
+    # The full catalog, one flat query per level
+    'admin catalog': {'subject', 'chapter', 'quiz', 'question'},
+    'user catalog': {'subject', 'chapter', 'quiz'},
+    # First page of the user listing: ORDER BY id LIMIT n walks the table from
+    # the start and stops after n rows; later pages seek on the cursor
+    'admin users': {'user'}
+}
+
+SCAN = re.compile(r'^SCAN (\w+)')
+EXPLAINABLE = re.compile(r'^\s*(SELECT|UPDATE|DELETE|INSERT|WITH)\b', re.IGNORECASE)
+
+def _scanned_tables(statements):
+    """Tables read by a full scan in any of the (statement, parameters) pairs"""
+    tables = set(db.metadata.tables)
+    scanned = {}
+    connection = db.session.connection()
+    for statement, parameters in statements:
+        if not EXPLAINABLE.match(statement):
+            continue
+        if isinstance(parameters, list):
+            # executemany; the plan is the same for every row
+            parameters = parameters[0]
+        for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters):
+            match = SCAN.match(row[-1])
+            if match and match.group(1) in tables:
+                scanned.setdefault(match.group(1), statement)
+    return scanned
+
+@pytest.fixture
+def run(client):
+    cache_module = sys.modules['app.cache']
+
+    def run(method, path, headers, json=None):
+        # Cache misses only, so the queries actually run
+        cache_module.get_redis_client().flushall()
+        cache_module.local_cache.clear()
+        with recorded_statements() as statements:
+            response = client.open(path, method=method, headers=headers, json=json)
+        assert response.status_code < 300, (path, response.data)
+        return response, _scanned_tables(statements)
+    return run
+
+def test_routes_do_not_scan_tables(run, users, admin_headers, user_headers):
+    _, user_id = users
+    quiz_id = seed_catalog(20, user_id=user_id)[0]
+    attempt_id = db.session.query(QuizAttempt.id).filter_by(quiz_id=quiz_id).scalar()
+    db.session.execute(insert(User), [{'email': f'student{i}@example.com', 'full_name': 'Student'} for i in range(3)])
+    db.session.commit()
+
+    scans = {}
+    requests = [
+        ('admin catalog', 'GET', '/api/admin/subjects', admin_headers),
+        ('admin quiz', 'GET', f'/api/admin/quizzes/{quiz_id}', admin_headers),
+        ('admin users', 'GET', '/api/admin/users?limit=1', admin_headers),
+        ('admin user', 'GET', f'/api/admin/users/{user_id}', admin_headers),
+        ('user catalog', 'GET', '/api/user/subjects', user_headers),
+        ('user quiz', 'GET', f'/api/user/quizzes/{quiz_id}', user_headers),
+        ('leaderboard', 'GET', f'/api/user/quizzes/{quiz_id}/leaderboard', user_headers),
+        ('attempts', 'GET', '/api/user/attempts?limit=5', user_headers),
+        ('all attempts', 'GET', '/api/user/attempts?paginate=false', user_headers),
+        ('attempt', 'GET', f'/api/user/attempts/{attempt_id}', user_headers),
+        ('stats', 'GET', '/api/user/stats', user_headers)
+    ]
+    for name, method, path, headers in requests:
+        response, scans[name] = run(method, path, headers)
+        if name in ('admin users', 'attempts'):
+            cursor = response.json['next_cursor']
+            _, scans[f'{name} page 2'] = run(method, f'{path}&cursor={cursor}', headers)
+
+    _, scans['attempt quiz'] = run('POST', f'/api/user/quizzes/{quiz_id}/attempt', user_headers, {'answers': []})
+    _, scans['login'] = run('POST', '/api/auth/login', None, {'email': 'user@example.com', 'password': 'pw'})
+    _, scans['block user'] = run('POST', f'/api/admin/users/{user_id}/block', admin_headers)
+
+    assert set(EXPECTED_SCANS) <= set(scans)
+    unexpected = {
+        name: {table: statement for table, statement in scanned.items() if table not in EXPECTED_SCANS.get(name, ())}
+        for name, scanned in scans.items()
+    }
+    assert {name: scanned for name, scanned in unexpected.items() if scanned} == {}
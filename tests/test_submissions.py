@@ -0,0 +1,114 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from app import celery, db, submissions, tasks
+from app.models import QuizAttempt
+from .conftest import seed_catalog
+
+@pytest.fixture
+def enqueue(app, users, monkeypatch):
+    _, user_id = users
+    quiz_id = seed_catalog(1)[0]
+    monkeypatch.setattr(submissions, '_schedule_drain', lambda client: None)
+
+    def enqueue(count):
+        now = datetime(2024, 1, 1, 9, 30)
+        return [
+            submissions.enqueue_submission(user_id, quiz_id, 1, now, now, [])
+            for _ in range(count)
+        ]
+    return enqueue
+
+def _stored():
+    return {submission_id for (submission_id,) in db.session.query(QuizAttempt.submission_id)}
+
+def test_drain_persists_batches_and_releases_the_lock(app, enqueue):
+    app.config['SUBMISSION_BATCH_SIZE'] = 2
+    submission_ids = enqueue(5)
+    assert submissions.drain_submission_queue() == 5
+    assert _stored() == set(submission_ids)
+
+    client = submissions.get_redis_client()
+    assert not client.exists(submissions.QUEUE_KEY, submissions.PROCESSING_KEY, submissions.DRAIN_LOCK_KEY)
+    assert submissions.get_submission_status(submission_ids[0])['status'] == 'persisted'
+
+def test_lock_is_renewed_for_every_batch(app, enqueue, monkeypatch):
+    app.config.update(SUBMISSION_BATCH_SIZE=1, SUBMISSION_DRAIN_LOCK_TIMEOUT=300)
+    enqueue(3)
+    ttls = []
+    persist_batch = submissions._persist_batch
+
+    def expiring_batch(client, raw_batch, token):
+        ttls.append(client.ttl(submissions.DRAIN_LOCK_KEY))
+        # Most of the lock timeout has gone by the time the batch finishes
+        client.expire(submissions.DRAIN_LOCK_KEY, 1)
+        return persist_batch(client, raw_batch, token)
+
+    monkeypatch.setattr(submissions, '_persist_batch', expiring_batch)
+    assert submissions.drain_submission_queue() == 3
+    assert ttls == [300, 300, 300]
+
+def test_drain_that_lost_its_lock_leaves_the_batch_alone(app, enqueue, monkeypatch):
+    app.config['SUBMISSION_BATCH_SIZE'] = 2
+    enqueue(4)
+    client = submissions.get_redis_client()
+    after_commit = submissions._after_commit
+
+    def lock_taken_over(client, payloads, attempt_ids):
+        # Our lock expired mid-batch and another drain took it
+        client.set(submissions.DRAIN_LOCK_KEY, 'other-drain')
+        after_commit(client, payloads, attempt_ids)
+
+    monkeypatch.setattr(submissions, '_after_commit', lock_taken_over)
+    assert submissions.drain_submission_queue() == 2
+
+    # The other drain's lock and its (replayable) processing list are untouched
+    assert client.get(submissions.DRAIN_LOCK_KEY) == b'other-drain'
+    assert client.llen(submissions.PROCESSING_KEY) == 2
+    assert client.llen(submissions.QUEUE_KEY) == 2
+    assert len(_stored()) == 2
+
+def test_submission_stored_by_another_drain_is_not_failed(app, enqueue, users, monkeypatch):
+    _, user_id = users
+    submission_ids = enqueue(3)
+    raced = submission_ids[1]
+    persist = submissions._persist
+
+    def racing_persist(payloads):
+        if any(payload['submission_id'] == raced for payload in payloads):
+            if raced not in _stored():
+                # The other drain commits the same submission first
+                payload = next(payload for payload in payloads if payload['submission_id'] == raced)
+                db.session.execute(insert(QuizAttempt).values(
+                    submission_id=raced, user_id=user_id, quiz_id=payload['quiz_id'],
+                    score=payload['score'], start_time=datetime(2024, 1, 1)
+                ))
+                db.session.commit()
+            raise IntegrityError('INSERT INTO quiz_attempt', {}, Exception('UNIQUE constraint failed'))
+        return persist(payloads)
+
+    monkeypatch.setattr(submissions, '_persist', racing_persist)
+    assert submissions.drain_submission_queue() == 3
+
+    client = submissions.get_redis_client()
+    assert client.llen(submissions.FAILED_KEY) == 0
+    assert _stored() == set(submission_ids)
+    status = submissions.get_submission_status(raced)
+    assert status['status'] == 'persisted'
+    assert status['attempt_id'] == db.session.query(QuizAttempt.id).filter_by(submission_id=raced).scalar()
+
+def test_periodic_drain_is_scheduled():
+    schedule = celery.conf.beat_schedule['drain-submissions']
+    assert schedule['task'] == 'app.tasks.drain_submissions'
+
+def test_worker_drain_replays_a_stranded_batch(app, enqueue, celery_worker):
+    submission_ids = enqueue(3)
+    client = submissions.get_redis_client()
+    # A drain that died mid-batch left its batch on the processing list
+    client.lmove(submissions.QUEUE_KEY, submissions.PROCESSING_KEY, 'LEFT', 'RIGHT')
+
+    assert tasks.drain_submissions.delay().get(timeout=10) == {'persisted': 3}
+    db.session.expire_all()
+    assert _stored() == set(submission_ids)
+    assert not client.exists(submissions.PROCESSING_KEY)